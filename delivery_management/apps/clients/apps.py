@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ClientsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.clients'
+
+    def ready(self):
+        from apps.core.cache import invalidate_on
+        from .models import Client
+
+        invalidate_on(Client, 'clients')
@@ -2,8 +2,9 @@ from django.shortcuts import render, redirect
 from .models import Client
 from .forms import ClientsForm
 from django.db.models import Q
-from django.http import HttpResponse
-import csv
+
+from apps.core.export import stream_queryset_csv
+from apps.core.pagination import paginate
 
 
 
@@ -27,8 +28,11 @@ def clients(request):
     if status and status != 'ALL':
         clients = clients.filter(client_type=status)
 
+    page = paginate(request, clients)
+
     context = {
-        'clients': clients,
+        'clients': page,
+        'page': page,
         'query': query,
         'status': status or 'ALL'
     }
@@ -76,27 +80,10 @@ def deleteclient(request, pk):
 
 
 def export_clients(request):
-    # Create the HttpResponse object with CSV headers
-    response = HttpResponse(
-        content_type='text/csv',
-        headers={'Content-Disposition': 'attachment; filename="clients.csv"'},
+    return stream_queryset_csv(
+        'clients.csv',
+        ['Code Client', 'Nom', 'Téléphone', 'Email', 'Adresse', 'Type', 'Solde'],
+        Client.objects.values_list(
+            'code_client', 'name', 'phone', 'email', 'address', 'client_type', 'balance'
+        ),
     )
-
-    writer = csv.writer(response)
-    # Write header row
-    writer.writerow(['Code Client', 'Nom', 'Téléphone', 'Email', 'Adresse', 'Type', 'Solde'])
-
-    # Write data rows
-    clients = Client.objects.all()
-    for client in clients:
-        writer.writerow([
-            client.code_client,
-            client.name,
-            client.phone,
-            client.email,
-            client.address,
-            client.client_type,
-            client.balance
-        ])
-
-    return response
@@ -0,0 +1,80 @@
+"""Authentication of the machine APIs (sorting-center scanners, B2B clients).
+
+Clients send `Authorization: Bearer <key>`. settings.API_KEYS maps each key
+to the username of the account it acts as: that account's role is checked
+like a logged-in user's, and it is recorded as the author of the changes.
+Without a key, a logged-in session is accepted with the usual CSRF check;
+the views are only exempt from CSRF for key-authenticated calls.
+"""
+from functools import wraps
+import hmac
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+
+
+def key_user(key):
+    """Active account of an API key, or None"""
+    username = None
+    for candidate, name in settings.API_KEYS.items():
+        # Compare every key in constant time
+        if hmac.compare_digest(candidate.encode(), key.encode()):
+            username = name
+    if username is None:
+        return None
+    return get_user_model().objects.filter(username=username, is_active=True).first()
+
+
+def csrf_failure(request):
+    """The CSRF middleware's response for a session request, or None if it passes"""
+    check = CsrfViewMiddleware(lambda request: None)
+    check.process_request(request)
+    return check.process_view(request, None, (), {})
+
+
+def rate_limited(request, scope, limit, period):
+    """True once the user has made more than `limit` `scope` calls in the current period"""
+    cache = caches['default']
+    key = f'ratelimit:{scope}:{request.user.pk}:{int(time.time() // period)}'
+    cache.add(key, 0, period)
+    try:
+        return cache.incr(key) > limit
+    except ValueError:
+        # Expired between add() and incr(): first call of the next period
+        return False
+
+
+def api_view(roles=('admin', 'agent'), rate=None):
+    """Decorator of an API view: API key or session, role in `roles`, at most `rate` = (calls, seconds)"""
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            header = request.headers.get('Authorization', '')
+            if header:
+                scheme, _, key = header.partition(' ')
+                user = key_user(key.strip()) if scheme.lower() == 'bearer' else None
+                if user is None:
+                    return JsonResponse({'success': False, 'error': 'Invalid API key'}, status=401)
+                request.user = user
+            elif request.user.is_authenticated:
+                rejected = csrf_failure(request)
+                if rejected is not None:
+                    return rejected
+            else:
+                return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+
+            if not (request.user.is_superuser or getattr(request.user, 'role', None) in roles):
+                return JsonResponse({'success': False, 'error': 'Not allowed for this account'}, status=403)
+            if rate and rate_limited(request, view.__name__, *rate):
+                response = JsonResponse({'success': False, 'error': 'Too many requests'}, status=429)
+                response['Retry-After'] = str(rate[1])
+                return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.core'
+    verbose_name = 'Outils communs'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .db import configure_sqlite
+
+        connection_created.connect(configure_sqlite, dispatch_uid='core.configure_sqlite')
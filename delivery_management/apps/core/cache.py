@@ -0,0 +1,117 @@
+"""Named caches with tag-based invalidation.
+
+Cached entries are stored under keys that embed the current version of
+each of their tags. Invalidating a tag only writes a new version, so every
+entry built with the old version is simply never read again (and expires).
+This works on any backend (locmem, file, Redis) without listing keys.
+
+    @cached_view('reclamations', cache_alias='stats')
+    def reclamation_stats(request): ...
+
+    clients = cached_queryset(Client.objects.order_by('name'), 'clients')
+
+    invalidate_on(Reclamation, 'reclamations')  # in AppConfig.ready() / signals.py
+
+The named caches are configured in settings.CACHES (default, tariffs, stats,
+sessions).
+"""
+from functools import wraps
+import hashlib
+import uuid
+
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+
+DEFAULT_TIMEOUT = 60 * 15
+TAGS_ALIAS = 'default'
+
+
+def tag_key(tag):
+    return f'tag:{tag}'
+
+
+def tag_versions(tags):
+    """Current version of each tag, creating the missing ones"""
+    cache = caches[TAGS_ALIAS]
+    keys = [tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex[:12] for key in keys if key not in versions}
+    if missing:
+        for key, version in missing.items():
+            cache.add(key, version, None)
+        versions.update(cache.get_many(list(missing)))
+    return [versions[key] for key in keys]
+
+
+def invalidate_tags(*tags):
+    caches[TAGS_ALIAS].set_many({tag_key(tag): uuid.uuid4().hex[:12] for tag in tags}, None)
+
+
+def tagged_key(name, tags):
+    digest = hashlib.md5(name.encode(), usedforsecurity=False).hexdigest()
+    return f"tagged:{digest}:{'.'.join(tag_versions(tags))}"
+
+
+def get_or_set(name, tags, compute, timeout=DEFAULT_TIMEOUT, cache_alias='default'):
+    """Return the cached value of `name` for the current versions of `tags`, computing it on a miss"""
+    cache = caches[cache_alias]
+    key = tagged_key(name, tags)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
+
+
+def cached_queryset(queryset, *tags, timeout=DEFAULT_TIMEOUT, cache_alias='default'):
+    """Evaluate `queryset` once per tag version and return its rows as a list"""
+    name = f'queryset:{queryset.model._meta.label}:{queryset.query}'
+    return get_or_set(name, tags, lambda: list(queryset), timeout, cache_alias)
+
+
+def cached_result(*tags, timeout=DEFAULT_TIMEOUT, cache_alias='default'):
+    """Cache the return value of a function per arguments and tag versions"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            name = f'{func.__module__}.{func.__qualname__}:{args!r}:{sorted(kwargs.items())!r}'
+            return get_or_set(name, tags, lambda: func(*args, **kwargs), timeout, cache_alias)
+        return wrapper
+    return decorator
+
+
+def cached_view(*tags, timeout=DEFAULT_TIMEOUT, cache_alias='stats', per_user=True):
+    """Cache the rendered page of a GET view until one of `tags` is invalidated.
+
+    Pages show the connected user, so entries are per user by default. Only
+    use it on pages without forms (a cached CSRF token would go stale).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+            user = request.user.pk if per_user and request.user.is_authenticated else None
+            name = f'view:{view.__module__}.{view.__qualname__}:{user}:{request.get_full_path()}'
+            cache = caches[cache_alias]
+            key = tagged_key(name, tags)
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    if hasattr(response, 'render') and callable(response.render):
+                        response = response.render()
+                    cache.set(key, response, timeout)
+            return response
+        return wrapper
+    return decorator
+
+
+def invalidate_on(model, *tags):
+    """Invalidate `tags` whenever an instance of `model` is saved or deleted"""
+    def receiver(sender, **kwargs):
+        invalidate_tags(*tags)
+
+    uid = f'invalidate:{model._meta.label}:{",".join(tags)}'
+    post_save.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
@@ -0,0 +1,54 @@
+import csv
+
+from django.http import StreamingHttpResponse
+
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Pseudo-buffer for csv.writer: write() hands the line back instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(filename, header, rows, bom=False):
+    """Stream `rows` as a CSV attachment, one line at a time"""
+    writer = csv.writer(Echo())
+
+    def lines():
+        if bom:
+            yield '\ufeff'  # BOM for Excel UTF-8
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    return StreamingHttpResponse(
+        lines(),
+        content_type='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+
+def stream_queryset_csv(filename, header, queryset, row=None, chunk_size=CHUNK_SIZE, bom=False):
+    """Stream a queryset (ideally a values_list projection) as CSV.
+
+    The queryset is read with .iterator() so memory stays flat whatever the
+    table size; `row` optionally formats each record before it is written.
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+    if row is not None:
+        rows = map(row, rows)
+    return stream_csv(filename, header, rows, bom=bom)
+
+
+def write_queryset_csv(path, header, queryset, row=None, chunk_size=CHUNK_SIZE, bom=False):
+    """Write a queryset as a CSV file at `path` (background exports); returns the number of rows"""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8-sig' if bom else 'utf-8') as output:
+        writer = csv.writer(output)
+        writer.writerow(header)
+        for record in queryset.iterator(chunk_size=chunk_size):
+            writer.writerow(row(record) if row is not None else record)
+            count += 1
+    return count
@@ -0,0 +1,110 @@
+"""Time-ordered, checksummed public identifiers (tracking numbers, references).
+
+    EXP-01JB3Q4T5V7KX2M9QD
+        |         |     `- check character (Luhn mod 32)
+        |         `------- 30-bit sequence, random start each millisecond
+        `----------------- 48-bit Unix time in milliseconds
+
+All characters come from Crockford's base32 alphabet (no I, L, O, U), so
+identifiers stay within [A-Z0-9-]. Successive identifiers of a process are
+strictly increasing: new rows land at the right edge of the unique index
+instead of at random pages. The random sequence start makes collisions
+between processes unlikely; callers still retry on IntegrityError (see
+insert_with_retry).
+"""
+import secrets
+import threading
+import time
+
+from django.db import IntegrityError, transaction
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+TIME_LENGTH = 10
+SEQUENCE_LENGTH = 6
+SEQUENCE_BITS = 5 * SEQUENCE_LENGTH
+BODY_LENGTH = TIME_LENGTH + SEQUENCE_LENGTH
+MAX_ATTEMPTS = 5
+
+_lock = threading.Lock()
+_last_ms = 0
+_next_sequence = 0
+
+
+def encode(number, length):
+    chars = []
+    for _ in range(length):
+        number, digit = divmod(number, 32)
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def check_character(body):
+    """Luhn mod 32: catches any single wrong character and most swaps of neighbours"""
+    total = 0
+    factor = 2
+    for char in reversed(body):
+        addend = factor * ALPHABET.index(char)
+        total += addend // 32 + addend % 32
+        factor = 1 if factor == 2 else 2
+    return ALPHABET[-total % 32]
+
+
+def _reserve(count):
+    """Reserve `count` consecutive (ms, sequence) slots, strictly after the previous ones"""
+    global _last_ms, _next_sequence
+    with _lock:
+        now = int(time.time() * 1000)
+        if now > _last_ms:
+            # New millisecond: random start in the lower half leaves room for the block
+            _last_ms = now
+            _next_sequence = secrets.randbits(SEQUENCE_BITS - 1)
+        if _next_sequence + count > 1 << SEQUENCE_BITS:
+            # Sequence exhausted: borrow the next millisecond
+            _last_ms += 1
+            _next_sequence = secrets.randbits(SEQUENCE_BITS - 1)
+        start = _next_sequence
+        _next_sequence += count
+        return _last_ms, start
+
+
+def allocate(prefix, count=1):
+    """Return `count` new identifiers, in increasing order"""
+    ms, start = _reserve(count)
+    identifiers = []
+    for sequence in range(start, start + count):
+        body = encode(ms, TIME_LENGTH) + encode(sequence, SEQUENCE_LENGTH)
+        identifiers.append(f"{prefix}-{body}{check_character(body)}")
+    return identifiers
+
+
+def new_identifier(prefix):
+    return allocate(prefix)[0]
+
+
+def has_valid_checksum(identifier, prefix):
+    """False only for identifiers in this format whose check character is wrong.
+
+    Identifiers of another shape (older formats, user supplied) are not judged.
+    """
+    head, _, body = identifier.partition('-')
+    if head != prefix or len(body) != BODY_LENGTH + 1 or any(char not in ALPHABET for char in body):
+        return True
+    return check_character(body[:-1]) == body[-1]
+
+
+def insert_with_retry(instance, field, prefix, save):
+    """Run save() (an INSERT) and retry with a new identifier when `field` collides.
+
+    Each attempt runs in a savepoint so a collision does not break the
+    surrounding transaction. Other integrity errors are re-raised.
+    """
+    model = type(instance)
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            value = getattr(instance, field)
+            if attempt == MAX_ATTEMPTS - 1 or not model._default_manager.filter(**{field: value}).exists():
+                raise
+            setattr(instance, field, new_identifier(prefix))
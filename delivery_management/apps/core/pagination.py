@@ -0,0 +1,115 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+PER_PAGE = 50
+
+
+class KeysetPage:
+    """One page of results with opaque cursors to the neighbouring pages"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """Paginate a queryset by seeking on its ordering instead of using OFFSET.
+
+    The ordering must be unique (end it with the primary key) so that every
+    row has a stable position. Cursors encode the key of the first/last row
+    of a page, so jumping to the next page costs the same at any depth.
+    """
+
+    def __init__(self, queryset, ordering=('-pk',), per_page=PER_PAGE):
+        self.queryset = queryset
+        self.per_page = per_page
+        opts = queryset.model._meta
+        self.keys = []
+        for name in ordering:
+            descending = name.startswith('-')
+            name = name.lstrip('-')
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+            self.keys.append((field, descending))
+
+    def _order_by(self, forward):
+        return [
+            f"{'-' if descending == forward else ''}{field.name}"
+            for field, descending in self.keys
+        ]
+
+    def _encode(self, direction, obj):
+        values = [field.value_to_string(obj) for field, _ in self.keys]
+        raw = json.dumps([direction, values], separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def _decode(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(raw)
+            if direction not in ('n', 'p') or len(values) != len(self.keys):
+                return None
+            values = [field.to_python(value) for (field, _), value in zip(self.keys, values)]
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            return None
+        return direction, values
+
+    def _seek(self, values, forward):
+        """Rows strictly after `values` in the direction of travel"""
+        condition = Q()
+        equal = {}
+        for (field, descending), value in zip(self.keys, values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= Q(**equal, **{f'{field.name}__{lookup}': value})
+            equal[field.name] = value
+        return condition
+
+    def get_page(self, cursor=None):
+        """Return the page designated by `cursor` (first page if missing or invalid)"""
+        decoded = self._decode(cursor) if cursor else None
+        direction, values = decoded or ('n', None)
+        forward = direction == 'n'
+
+        queryset = self.queryset.order_by(*self._order_by(forward))
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        if forward:
+            has_next, has_previous = has_more, values is not None
+        else:
+            has_next, has_previous = True, has_more
+
+        return KeysetPage(
+            rows,
+            next_cursor=self._encode('n', rows[-1]) if has_next and rows else None,
+            previous_cursor=self._encode('p', rows[0]) if has_previous and rows else None,
+        )
+
+
+def paginate(request, queryset, ordering=('-pk',), per_page=PER_PAGE):
+    """Shortcut used by the list views: read ?cursor= and return a KeysetPage"""
+    return KeysetPaginator(queryset, ordering, per_page).get_page(request.GET.get('cursor'))
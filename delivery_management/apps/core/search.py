@@ -0,0 +1,161 @@
+"""Full-text search over the denormalized `search_document` column of a model.
+
+Each searchable model keeps a `search_document` text column (built on save)
+and exposes `Model.objects.search(query)`. The backend is picked from the
+database engine:
+
+* SQLite: an FTS5 table `<db_table>_fts` with the trigram tokenizer, kept
+  in sync from signals, so substring queries of 3+ characters use the index.
+* PostgreSQL: `to_tsvector` full-text match or trigram-indexed icontains
+  (GIN indexes created by the migrations).
+* Anything else, or an FTS table that is missing: icontains on the single
+  `search_document` column, which still avoids the joins of the old search.
+"""
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+MIN_TRIGRAM_LENGTH = 3
+
+
+def search_terms(query):
+    return [term for term in (query or '').split() if term]
+
+
+def fts_table(model):
+    return f"{model._meta.db_table}_fts"
+
+
+class DocumentSearchBackend:
+    """Portable fallback: every term must appear in the search document"""
+
+    def filter(self, queryset, query):
+        for term in search_terms(query):
+            queryset = queryset.filter(search_document__icontains=term)
+        return queryset
+
+    def index(self, model, documents):
+        """Push (pk, document) pairs to the search index"""
+
+    def remove(self, model, pks):
+        """Drop rows from the search index"""
+
+
+class SQLiteFTSBackend(DocumentSearchBackend):
+    def filter(self, queryset, query):
+        terms = search_terms(query)
+        indexed = [term for term in terms if len(term) >= MIN_TRIGRAM_LENGTH]
+        if indexed:
+            table = fts_table(queryset.model)
+            match = ' '.join('"%s"' % term.replace('"', '""') for term in indexed)
+            queryset = queryset.filter(pk__in=RawSQL(
+                f"SELECT rowid FROM {table} WHERE {table} MATCH %s", [match]
+            ))
+        # Terms too short for trigrams are checked on the column
+        short = ' '.join(term for term in terms if len(term) < MIN_TRIGRAM_LENGTH)
+        return super().filter(queryset, short)
+
+    def index(self, model, documents):
+        documents = list(documents)
+        if not documents:
+            return
+        table = fts_table(model)
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {table} WHERE rowid = %s", [(pk,) for pk, _ in documents])
+            cursor.executemany(f"INSERT INTO {table} (rowid, document) VALUES (%s, %s)", documents)
+
+    def remove(self, model, pks):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {fts_table(model)} WHERE rowid = %s", [(pk,) for pk in pks])
+
+
+class PostgresSearchBackend(DocumentSearchBackend):
+    def filter(self, queryset, query):
+        from django.contrib.postgres.search import SearchQuery, SearchVector
+
+        terms = search_terms(query)
+        if not terms:
+            return queryset
+        contains = Q()
+        for term in terms:
+            contains &= Q(search_document__icontains=term)
+        return queryset.alias(
+            search_vector=SearchVector('search_document', config='simple'),
+        ).filter(
+            Q(search_vector=SearchQuery(query, config='simple', search_type='websearch')) | contains
+        )
+
+
+_fts_tables = {}
+
+
+def get_search_backend(model):
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    if connection.vendor == 'sqlite':
+        table = fts_table(model)
+        if table not in _fts_tables:
+            _fts_tables[table] = table in connection.introspection.table_names()
+        if _fts_tables[table]:
+            return SQLiteFTSBackend()
+    return DocumentSearchBackend()
+
+
+def reindex(model, instances):
+    """Index the current search_document of `instances`"""
+    get_search_backend(model).index(model, [(obj.pk, obj.search_document) for obj in instances])
+
+
+def refresh_documents(queryset, batch_size=500):
+    """Rebuild the search document of every row of `queryset` (after a related
+    client or destination was renamed). Only the rows that changed are written.
+    Select the relations used by build_search_document() on `queryset` first.
+    """
+    changed = []
+    for obj in queryset.iterator(chunk_size=batch_size):
+        document = obj.build_search_document()
+        if document != obj.search_document:
+            obj.search_document = document
+            changed.append(obj)
+    if changed:
+        queryset.model.objects.bulk_update(changed, ['search_document'], batch_size=batch_size)
+        reindex(queryset.model, changed)
+    return len(changed)
+
+
+# ---- Migration helpers ----
+
+def create_search_index(schema_editor, db_table):
+    """Create the engine-specific search index for `db_table`.search_document"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {db_table}_fts "
+                f"USING fts5(document, tokenize='trigram')"
+            )
+        except Exception:
+            # SQLite built without FTS5 or older than 3.34: keep the fallback backend
+            return
+        schema_editor.execute(
+            f"INSERT INTO {db_table}_fts (rowid, document) SELECT id, search_document FROM {db_table}"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {db_table}_search_fts ON {db_table} "
+            f"USING gin (to_tsvector('simple'::regconfig, COALESCE(search_document, ''::text)))"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {db_table}_search_trgm ON {db_table} "
+            f"USING gin (UPPER(search_document) gin_trgm_ops)"
+        )
+
+
+def drop_search_index(schema_editor, db_table):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {db_table}_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {db_table}_search_fts")
+        schema_editor.execute(f"DROP INDEX IF EXISTS {db_table}_search_trgm")
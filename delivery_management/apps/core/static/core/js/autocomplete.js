@@ -0,0 +1,85 @@
+// Pickers filled on demand (apps/core/widgets.py, AutocompleteSelect).
+// Every <select data-autocomplete-url> gets a search box; typed prefixes are
+// sent to the autocomplete API and the matching rows replace the options
+// that are not selected. "Plus de résultats" loads the next page.
+(function () {
+    function enhance(select) {
+        const input = document.createElement('input');
+        input.type = 'search';
+        input.className = 'form-control autocomplete-input';
+        input.placeholder = select.dataset.autocompletePlaceholder || 'Rechercher...';
+        input.autocomplete = 'off';
+        select.parentNode.insertBefore(input, select);
+
+        const more = document.createElement('button');
+        more.type = 'button';
+        more.className = 'btn-secondary autocomplete-more';
+        more.textContent = 'Plus de résultats';
+        more.hidden = true;
+        select.parentNode.insertBefore(more, select.nextSibling);
+
+        const forward = (select.dataset.autocompleteForward || '').split(',').filter(Boolean);
+        let next = null;
+        let timer = null;
+        let controller = null;
+
+        function query(cursor) {
+            const params = new URLSearchParams({ q: input.value.trim() });
+            if (cursor) {
+                params.set('cursor', cursor);
+            }
+            forward.forEach(function (name) {
+                const field = select.form && select.form.elements[name];
+                if (field && field.value) {
+                    params.set(name, field.value);
+                }
+            });
+            return params;
+        }
+
+        function load(append) {
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+            fetch(select.dataset.autocompleteUrl + '?' + query(append ? next : null), { signal: controller.signal })
+                .then(function (response) { return response.json(); })
+                .then(function (data) {
+                    if (!append) {
+                        Array.from(select.options).forEach(function (option) {
+                            if (!option.selected && option.value !== '') {
+                                option.remove();
+                            }
+                        });
+                    }
+                    const present = new Set(Array.from(select.options).map(function (option) { return option.value; }));
+                    data.results.forEach(function (item) {
+                        const value = String(item.id);
+                        if (!present.has(value)) {
+                            select.add(new Option(item.text, value));
+                        }
+                    });
+                    next = data.next;
+                    more.hidden = !next;
+                })
+                .catch(function () {});
+        }
+
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(function () { load(false); }, 250);
+        });
+        input.addEventListener('focus', function () { load(false); }, { once: true });
+        more.addEventListener('click', function () { load(true); });
+        forward.forEach(function (name) {
+            const field = select.form && select.form.elements[name];
+            if (field) {
+                field.addEventListener('change', function () { load(false); });
+            }
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('select[data-autocomplete-url]').forEach(enhance);
+    });
+})();
@@ -0,0 +1,23 @@
+"""Aggregate helpers shared by the statistics pages (reclamations, incidents).
+
+Both models record created_at and resolved_at; the resolution time is
+computed by the database so the pages never load the rows themselves.
+"""
+from django.db.models import Avg, DurationField, ExpressionWrapper, F
+
+
+def resolution_time():
+    """resolved_at - created_at, as a DurationField expression"""
+    return ExpressionWrapper(F('resolved_at') - F('created_at'), output_field=DurationField())
+
+
+def mean_resolution_time(resolved):
+    """Average resolution time of the rows matching the Q object `resolved`"""
+    return Avg(resolution_time(), filter=resolved)
+
+
+def duration_in_days(duration):
+    """timedelta in days, rounded to one decimal; None stays None"""
+    if duration is None:
+        return None
+    return round(duration.total_seconds() / 86400, 1)
@@ -0,0 +1,13 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def cursor_url(context, cursor=None):
+    """Current URL with ?cursor= replaced, keeping the active filters"""
+    params = context['request'].GET.copy()
+    params.pop('cursor', None)
+    if cursor:
+        params['cursor'] = cursor
+    return f"?{params.urlencode()}" if params else '?'
@@ -0,0 +1,53 @@
+from django import forms
+from django.urls import reverse
+
+
+class AutocompleteSelect(forms.Select):
+    """<select> of a ModelChoiceField filled on demand by the autocomplete API.
+
+    Only the selected value is rendered as an <option>; core/js/autocomplete.js
+    adds a search box that loads the matching rows page by page from
+    api/autocomplete/<source>/ (apps/logistics/autocomplete.py). `forward`
+    names other fields of the form whose value is sent along (e.g. the
+    client of a reclamation to restrict its shipments).
+    """
+
+    class Media:
+        js = ['core/js/autocomplete.js']
+
+    def __init__(self, source, forward=(), attrs=None):
+        super().__init__(attrs)
+        self.source = source
+        self.forward = tuple(forward)
+
+    def get_context(self, name, value, attrs):
+        attrs = dict(attrs or {})
+        attrs['data-autocomplete-url'] = reverse('autocomplete', args=[self.source])
+        if self.forward:
+            attrs['data-autocomplete-forward'] = ','.join(self.forward)
+        return super().get_context(name, value, attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        iterator = self.choices
+        if not hasattr(iterator, 'queryset'):
+            return super().optgroups(name, value, attrs)
+        field = iterator.field
+        selected = [v for v in value if v not in (None, '')]
+        choices = []
+        if field.empty_label is not None and not self.allow_multiple_selected:
+            choices.append(('', field.empty_label))
+        if selected:
+            try:
+                rows = list(iterator.queryset.filter(**{f'{field.to_field_name or "pk"}__in': selected}))
+            except (ValueError, TypeError):
+                rows = []
+            choices.extend(iterator.choice(obj) for obj in rows)
+        self.choices = choices
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = iterator
+
+
+class AutocompleteSelectMultiple(AutocompleteSelect, forms.SelectMultiple):
+    pass
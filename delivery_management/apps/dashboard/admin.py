@@ -1,3 +1,8 @@
 from django.contrib import admin
+from .models import ShipmentDailyStat
 
-# Register your models here.
+
+@admin.register(ShipmentDailyStat)
+class ShipmentDailyStatAdmin(admin.ModelAdmin):
+    list_display = ('day', 'status', 'agent', 'count')
+    list_filter = ('status', 'day')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.cache import invalidate_tags
+from apps.dashboard.rollups import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = "Recalcule la table de synthèse du tableau de bord (ShipmentDailyStat) depuis les expéditions"
+
+    def handle(self, *args, **options):
+        rows = rebuild_daily_stats()
+        invalidate_tags('shipments')
+        self.stdout.write(self.style.SUCCESS(f"{rows} lignes de synthèse recalculées"))
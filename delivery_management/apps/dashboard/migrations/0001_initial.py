@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def build_daily_stats(apps, schema_editor):
+    Shipment = apps.get_model('logistics', 'Shipment')
+    ShipmentDailyStat = apps.get_model('dashboard', 'ShipmentDailyStat')
+    rows = (
+        Shipment.objects.order_by()
+        .annotate(day=TruncDate('created_at'))
+        .values_list('day', 'status', 'created_by')
+        .annotate(n=Count('id'))
+    )
+    ShipmentDailyStat.objects.bulk_create([
+        ShipmentDailyStat(day=day, status=status, agent_id=agent_id, count=n)
+        for day, status, agent_id, n in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('logistics', '0010_shipment_search_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShipmentDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('agent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Statistique journalière',
+                'verbose_name_plural': 'Statistiques journalières',
+                'constraints': [models.UniqueConstraint(fields=('day', 'status', 'agent'), name='dailystat_day_status_agent_uniq')],
+            },
+        ),
+        migrations.RunPython(build_daily_stats, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,30 @@
+from django.conf import settings
 from django.db import models
 
-    # Create your models here.
\ No newline at end of file
+
+class ShipmentDailyStat(models.Model):
+    """Nombre d'expéditions créées un jour donné par un agent, par statut actuel.
+
+    Table de synthèse tenue à jour par les signaux (voir signals.py) et
+    reconstruite par la commande rebuild_dashboard_stats.
+    """
+    day = models.DateField()
+    status = models.CharField(max_length=20)
+    agent = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Statistique journalière"
+        verbose_name_plural = "Statistiques journalières"
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status', 'agent'], name='dailystat_day_status_agent_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status} {self.agent_id}: {self.count}"
@@ -0,0 +1,74 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.logistics.models import Shipment
+from .models import ShipmentDailyStat
+
+
+def stat_key(created_at, agent_id, status):
+    """(jour, statut, agent) d'une expédition dans la table de synthèse"""
+    return timezone.localdate(created_at) if created_at else timezone.localdate(), status, agent_id
+
+
+def adjust_daily_stats(deltas):
+    """Applique {(jour, statut, agent_id): delta} à la table de synthèse"""
+    for (day, status, agent_id), delta in deltas.items():
+        if not delta:
+            continue
+        rows = ShipmentDailyStat.objects.filter(day=day, status=status, agent_id=agent_id)
+        if rows.update(count=F('count') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                ShipmentDailyStat.objects.create(day=day, status=status, agent_id=agent_id, count=delta)
+        except IntegrityError:
+            # Ligne créée entre-temps par une autre requête
+            rows.update(count=F('count') + delta)
+
+
+def record_status_changes(changes):
+    """Met à jour la synthèse pour des changements (created_at, agent_id, ancien statut, nouveau statut).
+
+    Ancien statut None = création, nouveau statut None = suppression.
+    """
+    deltas = Counter()
+    for created_at, agent_id, old_status, new_status in changes:
+        if old_status == new_status:
+            continue
+        if old_status:
+            deltas[stat_key(created_at, agent_id, old_status)] -= 1
+        if new_status:
+            deltas[stat_key(created_at, agent_id, new_status)] += 1
+    adjust_daily_stats(deltas)
+
+
+def rebuild_daily_stats():
+    """Recalcule toute la table depuis les expéditions (une requête groupée)"""
+    rows = (
+        Shipment.objects.order_by()
+        .annotate(day=TruncDate('created_at'))
+        .values_list('day', 'status', 'created_by')
+        .annotate(n=Count('id'))
+    )
+    stats = [
+        ShipmentDailyStat(day=day, status=status, agent_id=agent_id, count=n)
+        for day, status, agent_id, n in rows
+    ]
+    with transaction.atomic():
+        ShipmentDailyStat.objects.all().delete()
+        ShipmentDailyStat.objects.bulk_create(stats, batch_size=500)
+    return len(stats)
+
+
+def dashboard_counts(agent=None, since=None):
+    """{statut: nombre d'expéditions} lu dans la synthèse, pour un agent et/ou depuis un jour"""
+    stats = ShipmentDailyStat.objects.all()
+    if agent is not None:
+        stats = stats.filter(agent=agent)
+    if since is not None:
+        stats = stats.filter(day__gte=since)
+    return dict(stats.order_by().values_list('status').annotate(n=Sum('count')))
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from apps.logistics.models import Shipment
+from apps.logistics.signals import shipment_statuses_changed
+from .rollups import record_status_changes
+
+
+@receiver(post_save, sender=Shipment)
+def update_daily_stats(sender, instance, created, **kwargs):
+    """Création ou changement de statut d'une expédition"""
+    old_status = None if created else getattr(instance, '_old_status', None)
+    if created or (old_status and old_status != instance.status):
+        record_status_changes([(instance.created_at, instance.created_by_id, old_status, instance.status)])
+
+
+@receiver(post_delete, sender=Shipment)
+def remove_from_daily_stats(sender, instance, **kwargs):
+    record_status_changes([(instance.created_at, instance.created_by_id, instance.status, None)])
+
+
+@receiver(shipment_statuses_changed)
+def update_daily_stats_in_bulk(sender, changes, **kwargs):
+    """Mises à jour groupées (transition de tournée, import de manifeste)"""
+    record_status_changes(changes)
@@ -1,35 +1,38 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseForbidden
-from apps.logistics.models import Shipment
+from apps.core.cache import cached_view
+from .rollups import dashboard_counts
+
+IN_PROGRESS_STATUSES = ('SORTING', 'TRANSIT', 'OUT_FOR_DELIVERY')
+
+
+def dashboard_context(counts):
+    """Indicateurs des tableaux de bord à partir de {statut: nombre}"""
+    return {
+        'total_expeditions': sum(counts.values()),
+        'livrees': counts.get('DELIVERED', 0),
+        'en_cours': sum(counts.get(status, 0) for status in IN_PROGRESS_STATUSES),
+        'creees': counts.get('REGISTERED', 0),
+    }
+
 
 @login_required
+@cached_view('shipments')
 def admin_dashboard(request):
     # Permettre l'accès à tous les utilisateurs authentifiés
-    expeditions = Shipment.objects.all()
-
-    context = {
-        'total_expeditions': expeditions.count(),
-        'livrees': expeditions.filter(status='LIVREE').count(),
-        'en_cours': expeditions.filter(status='EN_COURS').count(),
-        'creees': expeditions.filter(status='EN_ATTENTE').count(),
-    }
+    # Compteurs lus dans la table de synthèse ShipmentDailyStat (voir rollups.py)
+    context = dashboard_context(dashboard_counts())
 
     return render(request, 'dashboard/admin_dashboard.html', context)
 
 
 @login_required
+@cached_view('shipments')
 def agent_dashboard(request):
     if request.user.role != 'agent':
         return HttpResponseForbidden("Access denied")
 
-    expeditions = Shipment.objects.filter(created_by=request.user)
-
-    context = {
-        'total_expeditions': expeditions.count(),
-        'livrees': expeditions.filter(status='LIVREE').count(),
-        'en_cours': expeditions.filter(status='EN_COURS').count(),
-        'creees': expeditions.filter(status='EN_ATTENTE').count(),
-    }
+    context = dashboard_context(dashboard_counts(agent=request.user))
 
     return render(request, 'dashboard/agent_dashboard.html', context)
@@ -2,10 +2,11 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django import forms
-from decimal import Decimal
 
 from apps.logistics.models import Shipment, TypeService, Destination, Tour
+from apps.logistics.pricing import quote
 from apps.clients.models import Client
+from apps.core.widgets import AutocompleteSelect
 
 
 # Définition des formulaires pour chaque étape
@@ -14,7 +15,7 @@ class Step1Form(forms.Form):
     client = forms.ModelChoiceField(
         queryset=Client.objects.all(),
         label="Client",
-        widget=forms.Select(attrs={'class': 'form-control'})
+        widget=AutocompleteSelect('clients', attrs={'class': 'form-control'})
     )
     type_service = forms.ModelChoiceField(
         queryset=TypeService.objects.all(),
@@ -53,7 +54,7 @@ class Step3Form(forms.Form):
         queryset=Tour.objects.all(),
         label="Tournée",
         required=False,
-        widget=forms.Select(attrs={'class': 'form-control'})
+        widget=AutocompleteSelect('tours', attrs={'class': 'form-control'})
     )
 
 
@@ -198,22 +199,12 @@ def expedition_wizard(request):
 
 def calculate_price(expedition_data):
     """Calcule le prix estimé basé sur les données du wizard"""
-    price = Decimal('0.00')
-    
-    if expedition_data.get('destination_id'):
-        destination = Destination.objects.filter(id=expedition_data['destination_id']).first()
-        if destination and destination.zone:
-            price += destination.zone.base_price or Decimal('0')
-    
-    if expedition_data.get('type_service_id'):
-        service_type = TypeService.objects.filter(id=expedition_data['type_service_id']).first()
-        if service_type:
-            poids = Decimal(expedition_data.get('poids') or '0')
-            volume = Decimal(expedition_data.get('volume') or '0')
-            price += poids * (service_type.weight_rate or Decimal('0'))
-            price += volume * (service_type.volume_rate or Decimal('0'))
-    
-    return price
+    return quote(
+        expedition_data.get('destination_id'),
+        expedition_data.get('type_service_id'),
+        expedition_data.get('poids'),
+        expedition_data.get('volume'),
+    ).total
 
 
 @login_required
@@ -226,7 +217,10 @@ def calculate_price_ajax(request):
         'volume': request.GET.get('volume'),
     }
     
-    price = calculate_price(expedition_data)
+    try:
+        price = calculate_price(expedition_data)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Poids ou volume invalide'}, status=400)
     return JsonResponse({'success': True, 'montant': float(price)})
 
 
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class IncidentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.incidents'
+
+    def ready(self):
+        from apps.core.cache import invalidate_on
+        from .models import Incident
+
+        invalidate_on(Incident, 'incidents')
@@ -0,0 +1,40 @@
+"""Tâches en arrière-plan des incidents (apps/jobs/queue.py)"""
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+from django.db.models import Q
+
+from apps.jobs.queue import task
+from .models import Incident
+
+# Priorités pour lesquelles une alerte est envoyée à la création
+ALERT_PRIORITIES = ('haute', 'critique')
+
+
+@task('incidents.send_alert')
+def send_incident_alert(job, incident_id):
+    """Alerte par e-mail d'un incident prioritaire : au responsable assigné, sinon aux administrateurs"""
+    incident = Incident.objects.select_related('shipment', 'tour', 'assigned_to').filter(pk=incident_id).first()
+    if incident is None or incident.alert_sent:
+        return {'sent': 0}
+
+    if incident.assigned_to and incident.assigned_to.email:
+        recipients = [incident.assigned_to.email]
+    else:
+        recipients = list(
+            get_user_model().objects.filter(Q(role='admin') | Q(is_staff=True), is_active=True)
+            .exclude(email='').values_list('email', flat=True)
+        )
+    if recipients:
+        concerne = incident.shipment or (f"Tournée #{incident.tour.pk}" if incident.tour else '-')
+        send_mail(
+            f"[{incident.get_priority_display()}] {incident}",
+            f"Incident : {incident}\n"
+            f"Priorité : {incident.get_priority_display()}\n"
+            f"Concerne : {concerne}\n"
+            f"Déclaré le : {incident.created_at:%d/%m/%Y %H:%M}\n\n"
+            f"{incident.description}\n",
+            None,
+            recipients,
+        )
+    Incident.objects.filter(pk=incident.pk).update(alert_sent=True)
+    return {'sent': len(recipients)}
@@ -4,16 +4,22 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.utils import timezone
 from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+from datetime import timedelta
 
 from .models import Incident, IncidentDocument, IncidentComment
 from .forms import IncidentForm, IncidentStatusForm, IncidentDocumentForm, IncidentCommentForm
-from apps.logistics.models import Shipment
+from .tasks import ALERT_PRIORITIES
+from apps.core.cache import cached_view
+from apps.core.pagination import paginate
+from apps.core.stats import duration_in_days, mean_resolution_time
+from apps.jobs.queue import enqueue
 
 
 @login_required
 def incident_list(request):
     """Liste des incidents avec filtres"""
-    incidents = Incident.objects.all()
+    incidents = Incident.objects.select_related('shipment', 'tour')
     
     # Filtres
     status_filter = request.GET.get('status', '')
@@ -24,24 +30,23 @@ def incident_list(request):
     if type_filter:
         incidents = incidents.filter(incident_type=type_filter)
     
-    # Statistiques
-    stats = {
-        'ouverts': Incident.objects.filter(status='ouvert').count(),
-        'en_cours': Incident.objects.filter(status='en_cours').count(),
-        'resolus': Incident.objects.filter(status='resolu').count(),
-    }
+    # Statistiques (une seule requête)
+    stats = Incident.objects.aggregate(
+        ouverts=Count('id', filter=Q(status='ouvert')),
+        en_cours=Count('id', filter=Q(status='en_cours')),
+        resolus=Count('id', filter=Q(status='resolu')),
+    )
     
-    # Expéditions pour le modal de création
-    shipments = Shipment.objects.all()
+    page = paginate(request, incidents, ordering=('-created_at', '-pk'))
     
     context = {
-        'incidents': incidents,
+        'incidents': page,
+        'page': page,
         'stats': stats,
         'status_filter': status_filter,
         'type_filter': type_filter,
         'type_choices': Incident.TYPE_CHOICES,
         'status_choices': Incident.STATUS_CHOICES,
-        'shipments': shipments,
     }
     return render(request, 'incidents/incident_list.html', context)
 
@@ -55,6 +60,8 @@ def incident_create(request):
             incident = form.save(commit=False)
             incident.reported_by = request.user
             incident.save()
+            if incident.priority in ALERT_PRIORITIES:
+                enqueue('incidents.send_alert', created_by=request.user, incident_id=incident.pk)
             messages.success(request, 'Incident créé avec succès.')
             return redirect('incident_detail', pk=incident.pk)
     else:
@@ -136,3 +143,76 @@ def incident_update_status(request, pk):
         return JsonResponse({'success': False, 'error': 'Statut invalide'})
     
     return JsonResponse({'success': False, 'error': 'Méthode non autorisée'})
+
+
+@login_required
+@cached_view('incidents')
+def incident_stats(request):
+    """Statistiques des incidents: répartitions et délai moyen de résolution (MTTR)"""
+    resolved = Q(status='resolu', resolved_at__isnull=False)
+    type_labels = dict(Incident.TYPE_CHOICES)
+    
+    # Par type, avec le MTTR de chaque type (et le MTTR global qui s'en déduit)
+    type_rows = list(Incident.objects.order_by().values('incident_type').annotate(
+        count=Count('id'), resolved=Count('id', filter=resolved), mttr=mean_resolution_time(resolved)
+    ).order_by('-count'))
+    resolved_count = sum(row['resolved'] for row in type_rows)
+    mttr = None
+    if resolved_count:
+        mttr = sum((row['mttr'] * row['resolved'] for row in type_rows if row['mttr'] is not None),
+                   timedelta()) / resolved_count
+    by_type = [
+        {**row, 'label': type_labels.get(row['incident_type'], row['incident_type']),
+         'mttr': duration_in_days(row['mttr'])}
+        for row in type_rows
+    ]
+    
+    # Par statut et par priorité: une requête groupée sur les deux colonnes
+    status_labels = dict(Incident.STATUS_CHOICES)
+    priority_labels = dict(Incident.PRIORITY_CHOICES)
+    status_counts = dict.fromkeys(status_labels, 0)
+    priority_counts = dict.fromkeys(priority_labels, 0)
+    for status, priority, count in Incident.objects.order_by().values_list(
+        'status', 'priority'
+    ).annotate(count=Count('id')):
+        status_counts[status] = status_counts.get(status, 0) + count
+        priority_counts[priority] = priority_counts.get(priority, 0) + count
+    by_status = [
+        {'status': status, 'label': status_labels.get(status, status), 'count': count}
+        for status, count in status_counts.items()
+    ]
+    by_priority = [
+        {'priority': priority, 'label': priority_labels.get(priority, priority), 'count': count}
+        for priority, count in priority_counts.items()
+    ]
+    
+    # Par mois (derniers 6 mois)
+    six_months_ago = timezone.now() - timedelta(days=180)
+    by_month = list(Incident.objects.filter(
+        created_at__gte=six_months_ago
+    ).annotate(
+        month=TruncMonth('created_at')
+    ).values('month').annotate(
+        count=Count('id')
+    ).order_by('month'))
+    
+    # Par tournée (les 10 plus touchées), avec leur MTTR
+    by_tour = [
+        {**row, 'mttr': duration_in_days(row['mttr'])}
+        for row in Incident.objects.filter(tour__isnull=False).order_by().values(
+            'tour', 'tour__tour_date'
+        ).annotate(
+            count=Count('id'), mttr=mean_resolution_time(resolved)
+        ).order_by('-count', 'tour')[:10]
+    ]
+    
+    context = {
+        'total': sum(status_counts.values()),
+        'mttr': duration_in_days(mttr),
+        'by_type': by_type,
+        'by_status': by_status,
+        'by_priority': by_priority,
+        'by_month': by_month,
+        'by_tour': by_tour,
+    }
+    return render(request, 'incidents/incident_stats.html', context)
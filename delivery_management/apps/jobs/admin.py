@@ -0,0 +1,19 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task', 'status', 'attempts', 'max_attempts', 'run_at', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'task')
+    readonly_fields = ('locked_by', 'locked_at', 'result', 'last_error', 'created_at', 'finished_at')
+    actions = ['retry_jobs']
+
+    @admin.action(description="Relancer les tâches échouées sélectionnées")
+    def retry_jobs(self, request, queryset):
+        count = queryset.filter(status=Job.FAILED).update(
+            status=Job.QUEUED, run_at=timezone.now(), attempts=0, finished_at=None
+        )
+        self.message_user(request, f"{count} tâche(s) remise(s) en file.")
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.jobs'
+    verbose_name = 'Tâches en arrière-plan'
+
+    def ready(self):
+        from django.utils.module_loading import autodiscover_modules
+
+        # Every app declares its tasks in <app>/tasks.py (see apps/jobs/queue.py)
+        autodiscover_modules('tasks')
@@ -0,0 +1,73 @@
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from apps.jobs.queue import claim, requeue_stale, run_job
+
+# Seconds between two looks for jobs left running by a dead worker
+STALE_CHECK_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute les tâches en arrière-plan (apps.jobs). Chaque fil d'exécution prend une tâche "
+        "à la fois ; avec PostgreSQL, prévoir DB_POOL_MAX_SIZE au moins égal à --concurrency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help="Tâches exécutées en parallèle (fils)")
+        parser.add_argument('--poll', type=float, default=2.0, help="Secondes d'attente quand la file est vide")
+        parser.add_argument('--burst', action='store_true', help="S'arrêter dès que la file est vide")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            # Finish the jobs in progress, then exit
+            signal.signal(signum, lambda *_: stop.set())
+
+        name = f"{socket.gethostname()}:{os.getpid()}"
+        threads = [
+            threading.Thread(
+                target=self.work,
+                args=(f"{name}:{index}", stop, options['poll'], options['burst']),
+                name=f"worker-{index}",
+            )
+            for index in range(max(1, options['concurrency']))
+        ]
+        self.stdout.write(f"{name} : {len(threads)} fil(s) d'exécution")
+        for thread in threads:
+            thread.start()
+
+        next_check = 0
+        while any(thread.is_alive() for thread in threads):
+            if time.monotonic() >= next_check:
+                close_old_connections()
+                reset = requeue_stale()
+                if reset:
+                    self.stdout.write(self.style.WARNING(f"{reset} tâche(s) interrompue(s) remise(s) en file"))
+                next_check = time.monotonic() + STALE_CHECK_INTERVAL
+            for thread in threads:
+                thread.join(timeout=0.5)
+        connection.close()
+
+    def work(self, worker, stop, poll, burst):
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                job = claim(worker)
+                if job is None:
+                    if burst:
+                        break
+                    stop.wait(poll)
+                    continue
+                started = time.monotonic()
+                job = run_job(job)
+                message = f"[{worker}] {job.task} #{job.pk} : {job.get_status_display()} ({time.monotonic() - started:.1f} s)"
+                self.stdout.write(self.style.SUCCESS(message) if job.status == job.DONE else self.style.ERROR(message))
+        finally:
+            connection.close()
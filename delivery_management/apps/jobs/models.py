@@ -0,0 +1,63 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """A task run outside the request by `manage.py runworker` (apps/jobs/queue.py)"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'En attente'),
+        (RUNNING, 'En cours'),
+        (DONE, 'Terminée'),
+        (FAILED, 'Échouée'),
+    ]
+
+    task = models.CharField(max_length=100, verbose_name='Tâche')
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, verbose_name='Statut')
+    run_at = models.DateTimeField(default=timezone.now, verbose_name='Exécuter à partir de')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives')
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Tâche'
+        verbose_name_plural = 'Tâches'
+        indexes = [
+            # Claim: the next queued job whose time has come
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def output_dir(self):
+        return Path(settings.JOB_OUTPUT_DIR) / str(self.pk)
+
+    def output_path(self, filename):
+        """Where a task writes a file for this job (served by the jobs:download view)"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        return self.output_dir / filename
+
+    @property
+    def output_file(self):
+        """Path of the file produced by the job, or None"""
+        filename = (self.result or {}).get('file') if self.status == self.DONE else None
+        return self.output_dir / filename if filename else None
@@ -0,0 +1,152 @@
+"""Background jobs stored in the database (Job): no broker to run.
+
+Tasks live in the tasks.py of their app (loaded by JobsConfig.ready):
+
+    @task('logistics.export_expeditions')
+    def export_expeditions(job, params):
+        ...
+        return {'file': 'expeditions.csv'}
+
+    job = enqueue('logistics.export_expeditions', created_by=request.user, params=request.GET.dict())
+
+A task is called with its Job and the payload as keyword arguments (the
+payload must be JSON); what it returns is stored in Job.result. A task that
+writes a file puts it under job.output_path(name) and returns {'file': name}
+(served by the jobs:download view). The job row is written in the caller's
+transaction, so a worker only sees it once the request has committed.
+
+Workers (`manage.py runworker`) claim the oldest due job. Where the database
+supports it (PostgreSQL) the row is taken with SELECT ... FOR UPDATE SKIP
+LOCKED, so workers never wait on each other; otherwise (SQLite) the claim is
+a conditional UPDATE ... WHERE status = 'queued' and a worker that loses the
+race tries the next row. A task that raises is queued again after
+JOB_RETRY_DELAY * 2^(attempt - 1) seconds (with jitter, at most
+JOB_RETRY_MAX_DELAY) until max_attempts; PermanentFailure fails it at once.
+A job still running after JOB_TIMEOUT (its worker died) is queued again, so
+tasks must be safe to run twice.
+"""
+from datetime import timedelta
+from functools import partial
+import random
+import traceback
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+TASKS = {}
+
+# Due jobs a worker tries to claim in turn when another worker took the first one (no skip_locked)
+CLAIM_CANDIDATES = 10
+
+
+class UnknownTask(LookupError):
+    """No task registered under this name"""
+
+
+class PermanentFailure(Exception):
+    """Raised by a task when running it again cannot succeed: the job fails without retry"""
+
+
+def task(name, max_attempts=None):
+    """Register the decorated function as the task `name`"""
+    def register(function):
+        function.task_name = name
+        function.max_attempts = max_attempts
+        TASKS[name] = function
+        return function
+    return register
+
+
+def enqueue(name, created_by=None, run_at=None, **payload):
+    """Queue the task `name` with `payload`; returns the Job"""
+    function = TASKS.get(name)
+    if function is None:
+        raise UnknownTask(name)
+    job = Job.objects.create(
+        task=name,
+        payload=payload,
+        created_by=created_by if getattr(created_by, 'is_authenticated', False) else None,
+        run_at=run_at or timezone.now(),
+        max_attempts=function.max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+    if settings.JOBS_INLINE:
+        # No worker (development): run the job once the request has committed
+        transaction.on_commit(partial(run_inline, job.pk))
+    return job
+
+
+def claim(worker, pk=None):
+    """Mark the next due job (or job `pk`) as running for `worker`; returns it, or None"""
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by('run_at', 'pk')
+    if pk is not None:
+        due = due.filter(pk=pk)
+    changes = {'status': Job.RUNNING, 'locked_by': worker, 'locked_at': now, 'attempts': F('attempts') + 1}
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            claimed = due.select_for_update(skip_locked=True).values_list('pk', flat=True).first()
+            if claimed is None:
+                return None
+            Job.objects.filter(pk=claimed).update(**changes)
+    else:
+        for candidate in due.values_list('pk', flat=True)[:CLAIM_CANDIDATES]:
+            if Job.objects.filter(pk=candidate, status=Job.QUEUED).update(**changes):
+                claimed = candidate
+                break
+        else:
+            return None
+    return Job.objects.get(pk=claimed)
+
+
+def retry_delay(attempts):
+    """Wait before the next attempt after `attempts` failed ones"""
+    delay = min(settings.JOB_RETRY_DELAY * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_DELAY)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome; returns the job with its new status.
+
+    The outcome is only written while the job is still ours (not queued again
+    as stale in the meantime).
+    """
+    ours = Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by, locked_at=job.locked_at)
+    try:
+        function = TASKS.get(job.task)
+        if function is None:
+            raise UnknownTask(job.task)
+        result = function(job, **job.payload)
+    except Exception as error:
+        now = timezone.now()
+        job.last_error = traceback.format_exc()
+        if isinstance(error, (UnknownTask, PermanentFailure)) or job.attempts >= job.max_attempts:
+            job.status, job.finished_at = Job.FAILED, now
+            ours.update(status=job.status, last_error=job.last_error, finished_at=now)
+        else:
+            job.status, job.run_at = Job.QUEUED, now + retry_delay(job.attempts)
+            ours.update(status=job.status, last_error=job.last_error, run_at=job.run_at, locked_by='', locked_at=None)
+    else:
+        job.status, job.result, job.finished_at = Job.DONE, result, timezone.now()
+        ours.update(status=job.status, result=result, finished_at=job.finished_at, last_error='')
+    return job
+
+
+def run_inline(pk):
+    job = claim('inline', pk=pk)
+    if job is not None:
+        run_job(job)
+
+
+def requeue_stale():
+    """Queue again the jobs running for longer than JOB_TIMEOUT; returns how many were reset"""
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=settings.JOB_TIMEOUT))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_at=now, last_error="Interrompue : délai d'exécution dépassé"
+    )
+    return failed + stale.update(status=Job.QUEUED, run_at=now, locked_by='', locked_at=None)
@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import PermanentFailure, claim, enqueue, requeue_stale, run_job, task
+
+
+@task('jobs.tests.add')
+def add(job, a, b):
+    return {'sum': a + b}
+
+
+@task('jobs.tests.broken', max_attempts=2)
+def broken(job, permanent=False):
+    raise PermanentFailure("gone") if permanent else RuntimeError("try again")
+
+
+@override_settings(JOBS_INLINE=False, JOB_RETRY_DELAY=10, JOB_RETRY_MAX_DELAY=3600)
+class JobQueueTests(TestCase):
+    def test_claimed_once_and_result_stored(self):
+        job = enqueue('jobs.tests.add', a=2, b=3)
+
+        claimed = claim('w1')
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts), (job.pk, Job.RUNNING, 1))
+        self.assertIsNone(claim('w2'))
+
+        run_job(claimed)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), (Job.DONE, {'sum': 5}))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_not_claimed_before_run_at(self):
+        enqueue('jobs.tests.add', run_at=timezone.now() + timedelta(minutes=5), a=1, b=1)
+        self.assertIsNone(claim('w1'))
+
+    def test_retried_with_backoff_then_failed(self):
+        job = enqueue('jobs.tests.broken')
+        self.assertEqual(job.max_attempts, 2)
+
+        run_job(claim('w1'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=7))
+        self.assertIn('RuntimeError', job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        run_job(claim('w1'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_permanent_failure_is_not_retried(self):
+        job = enqueue('jobs.tests.broken', permanent=True)
+        run_job(claim('w1'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+
+    @override_settings(JOB_TIMEOUT=60)
+    def test_stale_job_queued_again_and_late_outcome_ignored(self):
+        job = enqueue('jobs.tests.add', a=1, b=2)
+        stale = claim('dead-worker')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(minutes=5))
+        stale.refresh_from_db()
+
+        self.assertEqual(requeue_stale(), 1)
+        again = claim('w2')
+        self.assertEqual((again.pk, again.attempts), (job.pk, 2))
+
+        # The first worker finishing late does not overwrite the new run
+        run_job(stale)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), (Job.RUNNING, 'w2'))
@@ -0,0 +1,51 @@
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
+
+from .models import Job
+
+
+def get_job(request, pk):
+    """The job `pk`, if it was started by this user (admins see every job)"""
+    job = get_object_or_404(Job, pk=pk)
+    user = request.user
+    if job.created_by_id != user.pk and not (user.is_staff or user.is_admin()):
+        raise Http404
+    return job
+
+
+def job_state(job):
+    output = job.output_file
+    return {
+        'id': job.pk,
+        'task': job.task,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'result': job.result,
+        'error': job.last_error.strip().splitlines()[-1] if job.last_error.strip() else '',
+        'download_url': reverse('jobs:download', args=[job.pk]) if output else None,
+    }
+
+
+@login_required
+def job_detail(request, pk):
+    """Page d'attente d'une tâche : suit son statut puis propose le fichier produit"""
+    job = get_job(request, pk)
+    return render(request, 'jobs/job_detail.html', {'job': job, 'state': job_state(job)})
+
+
+@login_required
+def job_status(request, pk):
+    return JsonResponse(job_state(get_job(request, pk)))
+
+
+@login_required
+def job_download(request, pk):
+    output = get_job(request, pk).output_file
+    if output is None or not output.is_file():
+        raise Http404
+    # PDF and printable pages open in the browser, exports are downloaded
+    return FileResponse(output.open('rb'), as_attachment=output.suffix == '.csv', filename=output.name)
@@ -1,13 +1,31 @@
 from django.contrib import admin
+
+from apps.jobs.queue import enqueue
 from .models import Shipment, Driver, Vehicule, Tour, TypeService, Destination, Zone
 
 # Register your models here.
 
+def transition_action(status, label):
+    """Admin action moving the selected shipments to `status` in a background job"""
+    def action(modeladmin, request, queryset):
+        job = enqueue(
+            'logistics.transition_shipments', created_by=request.user,
+            shipment_ids=list(queryset.values_list('pk', flat=True)), status=status,
+        )
+        modeladmin.message_user(request, f"Tâche #{job.pk} : {label.lower()} en arrière-plan.")
+    action.__name__ = f'transition_to_{status.lower()}'
+    return admin.action(description=f"{label} (en arrière-plan)")(action)
+
+
 @admin.register(Shipment)
 class ExpeditionAdmin(admin.ModelAdmin):
     list_display = ('tracking_number', 'id_client', 'status', 'id_service_type', 'id_destination', 'id_tour', 'total_price', 'created_at')
     list_filter = ('status', 'id_service_type', 'created_at')
     search_fields = ('tracking_number',)
+    actions = [
+        transition_action(status, f"Passer en « {label} »")
+        for status, label in Shipment.STATUS_CHOICES if status != 'REGISTERED'
+    ]
 
 @admin.register(Driver)
 class DriverAdmin(admin.ModelAdmin):
@@ -0,0 +1,75 @@
+"""Sources of the autocomplete API (api/autocomplete/<source>/).
+
+The pickers of the creation forms (incident modal, ReclamationForm, the
+expedition wizard) no longer render every shipment, tour or client as an
+<option>: they ask this API for the rows matching what the user typed, one
+keyset page at a time (apps/core/pagination.py).
+
+Shipments are matched on a tracking number prefix with a range condition
+(tracking_number >= 'EXP-01' AND < 'EXP-02') that seeks the unique index,
+whatever the database collation.
+"""
+from collections import namedtuple
+
+from django.db.models import Q
+
+from apps.clients.models import Client
+from .importers import is_id
+from .models import Shipment, Tour
+from .tracking import normalize_tracking_number
+
+PER_PAGE = 20
+
+Source = namedtuple('Source', ['queryset', 'search', 'ordering', 'label'])
+
+
+def prefix_range(field, prefix):
+    """Rows whose `field` starts with `prefix`, as an index-friendly range"""
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': upper})
+
+
+def search_shipments(queryset, term, params):
+    client = params.get('client')
+    if client:
+        queryset = queryset.filter(id_client_id=client) if is_id(client) else queryset.none()
+    term = normalize_tracking_number(term)
+    return queryset.filter(prefix_range('tracking_number', term)) if term else queryset
+
+
+def search_tours(queryset, term, params):
+    if not term:
+        return queryset
+    # Tours have no name: match the number, or the date (YYYY-MM-DD)
+    if is_id(term):
+        return queryset.filter(pk=term)
+    return queryset.filter(tour_date__startswith=term)
+
+
+def search_clients(queryset, term, params):
+    if not term:
+        return queryset
+    # Codes are entered in upper case, names are matched in any case
+    return queryset.filter(prefix_range('code_client', term.upper()) | Q(name__istartswith=term))
+
+
+SOURCES = {
+    'shipments': Source(
+        lambda: Shipment.objects.only('pk', 'tracking_number'),
+        search_shipments,
+        ('tracking_number', 'pk'),
+        lambda shipment: shipment.tracking_number,
+    ),
+    'tours': Source(
+        lambda: Tour.objects.only('pk', 'tour_date'),
+        search_tours,
+        ('-pk',),
+        str,
+    ),
+    'clients': Source(
+        lambda: Client.objects.only('pk', 'code_client', 'name'),
+        search_clients,
+        ('name', 'pk'),
+        lambda client: f"{client.name} ({client.code_client})",
+    ),
+}
@@ -0,0 +1,60 @@
+from django.db.models import Count, F
+
+from .models import Shipment, ShipmentStatusCounter
+
+
+def shipment_counts(statuses=None):
+    """{status: number of shipments} for `statuses` (default: every status), one grouped query"""
+    statuses = [status for status, _ in Shipment.STATUS_CHOICES] if statuses is None else list(statuses)
+    counts = dict.fromkeys(statuses, 0)
+    counts.update(
+        Shipment.objects.filter(status__in=statuses).order_by().values_list('status').annotate(n=Count('id'))
+    )
+    return counts
+
+
+def seed_status_counter(status):
+    """Create the counter row of `status` from the shipments; False if another process created it first.
+
+    The table is seeded by migration 0013: this only runs for a status added
+    since, or on a database created without migrations (tests).
+    """
+    _, created = ShipmentStatusCounter.objects.get_or_create(
+        status=status, defaults={'count': shipment_counts([status])[status]}
+    )
+    return created
+
+
+def rebuild_status_counters():
+    """Recompute the counter rows from the shipments (repair after changes made outside the ORM)"""
+    counts = shipment_counts()
+    for status, count in counts.items():
+        ShipmentStatusCounter.objects.update_or_create(status=status, defaults={'count': count})
+    return counts
+
+
+def status_counts():
+    """Return {status: number of shipments} read from the counter table"""
+    counts = dict(ShipmentStatusCounter.objects.values_list('status', 'count'))
+    missing = [status for status, _ in Shipment.STATUS_CHOICES if status not in counts]
+    if missing:
+        for status in missing:
+            seed_status_counter(status)
+        counts.update(ShipmentStatusCounter.objects.filter(status__in=missing).values_list('status', 'count'))
+    return counts
+
+
+def adjust_status_counters(deltas):
+    """Apply {status: delta} to the counter table (used by signals and bulk updates).
+
+    Called after the shipments were written: a row seeded here already counts them.
+    """
+    for status, delta in deltas.items():
+        if not delta:
+            continue
+        updated = ShipmentStatusCounter.objects.filter(status=status).update(
+            count=F('count') + delta
+        )
+        if not updated and not seed_status_counter(status):
+            # Seeded meanwhile by another process, from shipments that may not include ours yet
+            ShipmentStatusCounter.objects.filter(status=status).update(count=F('count') + delta)
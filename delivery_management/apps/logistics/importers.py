@@ -0,0 +1,324 @@
+"""Bulk import of shipments from client manifests (CSV or JSON Lines).
+
+Columns / keys of a manifest row:
+
+    client                   client code (Client.code_client) or id   required
+    service_type             service name (TypeService.nom) or id     required
+    destination              destination id                           required
+    weight, volume           kg / m3
+    description
+    estimated_delivery_date  YYYY-MM-DD
+    tracking_number          optional, generated when empty
+
+The file is read as a stream and handled `chunk_size` rows at a time:
+foreign keys are resolved through lookup maps filled with one query per
+chunk, prices come from pricing.quote_many(), and shipments and their
+initial history rows are written with bulk_create. post_save is not sent,
+so the status counters, the search index and the dashboard rollups
+(shipment_statuses_changed) are updated here once per chunk.
+Invalid rows are skipped and reported with their line number.
+
+Each chunk is committed on its own. When the import stops on an error
+(database error, bytes that are not UTF-8), the chunks before it stay
+saved: the result gives the error and the last manifest line committed,
+so the rest of the file can be imported again from the next line.
+"""
+from collections import namedtuple
+import csv
+import json
+import math
+
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+from apps.clients.models import Client
+from apps.core.cache import invalidate_tags
+from apps.core.identifiers import MAX_ATTEMPTS
+from apps.core.search import reindex
+from .counters import adjust_status_counters
+from .models import Destination, Shipment, ShipmentQuerySet, ShipmentStatusHistory, TypeService
+from .pricing import quote_many
+from .signals import shipment_statuses_changed
+from .tracking import TRACKING_NUMBER_RE, normalize_tracking_number
+
+CHUNK_SIZE = 2000
+FORMATS = ('csv', 'jsonl')
+
+# Largest manifest accepted through the web form; bigger files go through `manage.py import_shipments`
+MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+
+RowError = namedtuple('RowError', ['line', 'message'])
+
+
+class ManifestRowError(ValueError):
+    pass
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+        # Last manifest line of the last committed chunk, and why the import stopped early
+        self.committed_through = None
+        self.failure = None
+
+    @property
+    def rows(self):
+        return self.created + len(self.errors)
+
+
+def guess_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_csv(stream):
+    """Yield (line number, row dict) from a CSV text stream with a header line"""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_jsonl(stream):
+    """Yield (line number, row dict) from a JSON Lines text stream, None for bad lines"""
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def read_manifest(stream, format='csv'):
+    return read_jsonl(stream) if format == 'jsonl' else read_csv(stream)
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def text(row, key):
+    value = row.get(key)
+    return '' if value is None else str(value).strip()
+
+
+def is_id(key):
+    """True for a database id; str.isdigit() alone also accepts digits such as '²' that int() rejects"""
+    return key.isascii() and key.isdigit()
+
+
+def positive_float(row, key):
+    value = text(row, key)
+    if not value:
+        return None
+    try:
+        number = float(value.replace(',', '.'))
+        if not math.isfinite(number):
+            raise ValueError(value)
+    except ValueError:
+        raise ManifestRowError(f"{key}: nombre invalide '{value}'")
+    if number < 0:
+        raise ManifestRowError(f"{key}: doit être positif")
+    return number
+
+
+class ShipmentImporter:
+    def __init__(self, created_by=None, chunk_size=CHUNK_SIZE, dry_run=False):
+        self.created_by = created_by
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        # Lookup maps, filled chunk by chunk: manifest key -> Client / pk / Destination
+        self.clients = {}
+        self.services = {}
+        self.destinations = {}
+        self.tracking_numbers = set()
+
+    def run(self, rows):
+        """Import an iterable of (line number, row dict) and return an ImportResult"""
+        result = ImportResult()
+        self.load_services()
+        try:
+            for chunk in chunked(rows, self.chunk_size):
+                self.import_chunk(chunk, result)
+                if not self.dry_run:
+                    result.committed_through = chunk[-1][0]
+        except UnicodeDecodeError:
+            result.failure = "le fichier doit être encodé en UTF-8"
+        except DatabaseError as error:
+            result.failure = f"erreur de base de données ({error})"
+        return result
+
+    # ---- Lookups ----
+
+    def load_services(self):
+        for pk, name in TypeService.objects.values_list('pk', 'nom'):
+            self.services[str(pk)] = pk
+            self.services[name.strip().lower()] = pk
+
+    def load_lookups(self, chunk):
+        rows = [row for _, row in chunk if row is not None]
+        client_keys = {text(row, 'client') for row in rows} - set(self.clients) - {''}
+        if client_keys:
+            ids = [int(key) for key in client_keys if is_id(key)]
+            clients = Client.objects.filter(Q(code_client__in=client_keys) | Q(pk__in=ids))
+            for client in clients.only('pk', 'code_client', 'name'):
+                self.clients[client.code_client] = client
+                self.clients[str(client.pk)] = client
+        destination_ids = {
+            int(key) for key in (text(row, 'destination') for row in rows) if is_id(key)
+        } - set(self.destinations)
+        if destination_ids:
+            for destination in Destination.objects.filter(pk__in=destination_ids).only('pk', 'ville'):
+                self.destinations[destination.pk] = destination
+
+    def existing_tracking_numbers(self, numbers):
+        return set(Shipment.objects.filter(tracking_number__in=numbers).values_list('tracking_number', flat=True))
+
+    # ---- Rows ----
+
+    def build(self, row):
+        if row is None:
+            raise ManifestRowError("ligne JSON invalide")
+
+        client = self.clients.get(text(row, 'client'))
+        if client is None:
+            raise ManifestRowError(f"client inconnu '{text(row, 'client')}'")
+        service_id = self.services.get(text(row, 'service_type').lower())
+        if service_id is None:
+            raise ManifestRowError(f"type de service inconnu '{text(row, 'service_type')}'")
+        key = text(row, 'destination')
+        destination = self.destinations.get(int(key)) if is_id(key) else None
+        if destination is None:
+            raise ManifestRowError(f"destination inconnue '{key}'")
+
+        estimated = text(row, 'estimated_delivery_date')
+        try:
+            estimated_date = parse_date(estimated) if estimated else None
+        except ValueError:
+            estimated_date = None
+        if estimated and estimated_date is None:
+            raise ManifestRowError(f"estimated_delivery_date: date invalide '{estimated}'")
+
+        tracking_number = normalize_tracking_number(text(row, 'tracking_number'))
+        if tracking_number and not TRACKING_NUMBER_RE.match(tracking_number):
+            raise ManifestRowError(f"numéro de suivi invalide '{tracking_number}'")
+
+        return Shipment(
+            tracking_number=tracking_number,
+            # Related objects from the lookup maps: build_search_document() needs no query
+            id_client=client,
+            id_service_type_id=service_id,
+            id_destination=destination,
+            weight=positive_float(row, 'weight'),
+            volume=positive_float(row, 'volume'),
+            description=text(row, 'description'),
+            estimated_delivery_date=estimated_date,
+            created_by=self.created_by,
+            status='REGISTERED',
+        )
+
+    def assign_tracking_numbers(self, shipments, result):
+        """Reject duplicate tracking numbers given in the manifest, generate the missing ones.
+
+        Returns (valid shipments, shipments with a generated number).
+        """
+        taken = self.tracking_numbers
+        given = [shipment.tracking_number for _, shipment in shipments if shipment.tracking_number]
+        if given:
+            taken |= self.existing_tracking_numbers(given)
+        valid = []
+        for line, shipment in shipments:
+            if shipment.tracking_number:
+                if shipment.tracking_number in taken:
+                    result.errors.append(RowError(line, f"numéro de suivi déjà utilisé '{shipment.tracking_number}'"))
+                    continue
+                taken.add(shipment.tracking_number)
+            valid.append(shipment)
+
+        generated = [shipment for shipment in valid if not shipment.tracking_number]
+        self.number(generated)
+        return valid, generated
+
+    def number(self, shipments):
+        """Give `shipments` tracking numbers from one time-ordered block (apps/core/identifiers.py)"""
+        for shipment, number in zip(shipments, Shipment.new_tracking_numbers(len(shipments))):
+            shipment.tracking_number = number
+
+    def import_chunk(self, chunk, result):
+        self.load_lookups(chunk)
+        shipments = []
+        for line, row in chunk:
+            try:
+                shipments.append((line, self.build(row)))
+            except ManifestRowError as error:
+                result.errors.append(RowError(line, str(error)))
+        shipments, generated = self.assign_tracking_numbers(shipments, result)
+        if not shipments:
+            return
+
+        quotes = quote_many(
+            (s.id_destination_id, s.id_service_type_id, s.weight, s.volume) for s in shipments
+        )
+        for shipment, price in zip(shipments, quotes):
+            shipment.total_price = price.total
+            shipment.search_document = shipment.build_search_document()
+
+        if self.dry_run:
+            result.created += len(shipments)
+            return
+
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    self.insert(shipments)
+                break
+            except IntegrityError:
+                # A generated tracking number collided: draw a new block and retry
+                if attempt == MAX_ATTEMPTS - 1 or not generated:
+                    raise
+                self.number(generated)
+                for shipment in shipments:
+                    shipment.search_document = shipment.build_search_document()
+                    shipment.pk = None
+                    shipment._state.adding = True
+        invalidate_tags('shipments')
+        result.created += len(shipments)
+
+    def insert(self, shipments):
+        Shipment.objects.bulk_create(shipments, batch_size=ShipmentQuerySet.BATCH_SIZE)
+        if any(shipment.pk is None for shipment in shipments):
+            # Database without INSERT ... RETURNING: read the new ids back
+            ids = dict(Shipment.objects.filter(
+                tracking_number__in=[shipment.tracking_number for shipment in shipments]
+            ).values_list('tracking_number', 'pk'))
+            for shipment in shipments:
+                shipment.pk = ids[shipment.tracking_number]
+        ShipmentStatusHistory.objects.bulk_create([
+            ShipmentStatusHistory(
+                shipment_id=shipment.pk,
+                status=shipment.status,
+                changed_by=self.created_by,
+                notes="Expédition créée",
+            )
+            for shipment in shipments
+        ], batch_size=ShipmentQuerySet.BATCH_SIZE)
+        adjust_status_counters({'REGISTERED': len(shipments)})
+        shipment_statuses_changed.send(sender=Shipment, changes=[
+            (shipment.created_at, shipment.created_by_id, None, shipment.status) for shipment in shipments
+        ])
+        reindex(Shipment, shipments)
+
+
+def import_manifest(stream, format='csv', **options):
+    """Import a manifest text stream; options are passed to ShipmentImporter"""
+    return ShipmentImporter(**options).run(read_manifest(stream, format))
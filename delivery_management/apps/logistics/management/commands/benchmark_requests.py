@@ -0,0 +1,95 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from apps.logistics.models import Shipment
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the throughput of expedition_list and track_expedition with the "
+        "database profile of the current settings (see DB_ENGINE in settings.py)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help="Concurrent clients")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per view")
+        parser.add_argument('--warmup', type=int, default=10, help="Requests per view before measuring")
+
+    def profile(self):
+        db = settings.DATABASES['default']
+        lines = [f"engine: {connection.vendor} ({db['NAME']})"]
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size'):
+                    cursor.execute(f'PRAGMA {name}')
+                    lines.append(f"{name}: {cursor.fetchone()[0]}")
+        else:
+            lines.append(f"CONN_MAX_AGE: {db.get('CONN_MAX_AGE', 0)}")
+            lines.append(f"CONN_HEALTH_CHECKS: {db.get('CONN_HEALTH_CHECKS', False)}")
+            lines.append(f"pool: {db.get('OPTIONS', {}).get('pool') or 'off'}")
+        return lines
+
+    def run(self, path, params, total, threads):
+        """Send `total` GET requests from `threads` clients; return (wall time, latencies)"""
+        host = next((h for h in settings.ALLOWED_HOSTS if h != '*' and not h.startswith('.')), 'localhost')
+        latencies = []
+        lock = threading.Lock()
+
+        def worker(count):
+            client = Client(HTTP_HOST=host)
+            own = []
+            try:
+                for _ in range(count):
+                    started = time.perf_counter()
+                    response = client.get(path, params)
+                    own.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        raise CommandError(f"{path} answered {response.status_code}")
+            finally:
+                connections.close_all()
+            with lock:
+                latencies.extend(own)
+
+        shares = [total // threads + (1 if i < total % threads else 0) for i in range(threads)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for future in [pool.submit(worker, count) for count in shares if count]:
+                future.result()
+        return time.perf_counter() - started, latencies
+
+    def handle(self, *args, **options):
+        threads, total = options['threads'], options['requests']
+        if threads < 1 or total < 1:
+            raise CommandError("--threads and --requests must be positive")
+
+        for line in self.profile():
+            self.stdout.write(line)
+
+        tracking_number = Shipment.objects.order_by('-pk').values_list('tracking_number', flat=True).first()
+        if tracking_number is None:
+            raise CommandError("No shipment in the database: import some first (import_shipments)")
+        targets = [
+            ("expedition_list", reverse('expedition_list'), {}),
+            ("expedition_list ?status=", reverse('expedition_list'), {'status': 'REGISTERED'}),
+            ("track_expedition", reverse('track_expedition'), {'tracking': tracking_number}),
+        ]
+
+        self.stdout.write(f"\n{threads} threads, {total} requests per view")
+        for label, path, params in targets:
+            if options['warmup']:
+                self.run(path, params, options['warmup'], 1)
+            elapsed, latencies = self.run(path, params, total, threads)
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            self.stdout.write(
+                f"{label:<26} {total / elapsed:8.1f} req/s   "
+                f"p50 {statistics.median(latencies) * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms"
+            )
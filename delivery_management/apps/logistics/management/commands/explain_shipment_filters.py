@@ -0,0 +1,71 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.logistics.models import Shipment, ShipmentStatusHistory
+from apps.logistics.views import day_start
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the query plan and timing of the hot shipment filters, "
+        "without (before) and with (after) the composite indexes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help="Runs per query for the timing")
+
+    def hot_queries(self):
+        client_id = Shipment.objects.exclude(id_client=None).values_list('id_client', flat=True).first()
+        shipment_id = Shipment.objects.values_list('pk', flat=True).first()
+        since = timezone.localdate() - timedelta(days=30)
+        page = ('-created_at', '-pk')
+        return [
+            ("status filter", Shipment.objects.filter(status='TRANSIT').order_by(*page)[:50]),
+            ("client filter", Shipment.objects.filter(id_client=client_id).order_by(*page)[:50]),
+            ("date filter (created_at__date)",
+             Shipment.objects.filter(created_at__date__gte=since).order_by(*page)[:50]),
+            ("date filter (datetime range)",
+             Shipment.objects.filter(created_at__gte=day_start(since.isoformat())).order_by(*page)[:50]),
+            ("status history of one shipment",
+             ShipmentStatusHistory.objects.filter(shipment=shipment_id).order_by('changed_at')),
+        ]
+
+    def measure(self, repeat):
+        results = {}
+        for label, queryset in self.hot_queries():
+            plan = queryset.explain()
+            started = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset.all())
+            results[label] = (plan, (time.perf_counter() - started) * 1000 / repeat)
+        return results
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            for model in (Shipment, ShipmentStatusHistory):
+                for index in model._meta.indexes:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        self.stdout.write(f"{Shipment.objects.count()} shipments, {connection.vendor} backend\n")
+
+        # The indexes are dropped inside a transaction that is rolled back
+        with transaction.atomic():
+            self.drop_indexes()
+            before = self.measure(repeat)
+            transaction.set_rollback(True)
+        # Fresh connection so no statement prepared without the indexes is reused
+        connection.close()
+        after = self.measure(repeat)
+
+        for label in after:
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            for name, (plan, elapsed) in (('before', before[label]), ('after', after[label])):
+                self.stdout.write(f"  {name}: {elapsed:.2f} ms")
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
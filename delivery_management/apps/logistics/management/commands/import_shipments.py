@@ -0,0 +1,56 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.logistics.importers import CHUNK_SIZE, FORMATS, guess_format, import_manifest
+
+
+class Command(BaseCommand):
+    help = "Import shipments from a CSV or JSON Lines manifest (see apps/logistics/importers.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Manifest file")
+        parser.add_argument('--format', choices=FORMATS, help="Default: guessed from the extension")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--user', help="Username recorded as creator of the shipments")
+        parser.add_argument('--dry-run', action='store_true', help="Validate only, write nothing")
+
+    def handle(self, *args, **options):
+        created_by = None
+        if options['user']:
+            User = get_user_model()
+            try:
+                created_by = User.objects.get(**{User.USERNAME_FIELD: options['user']})
+            except User.DoesNotExist:
+                raise CommandError(f"Unknown user '{options['user']}'")
+
+        path = options['path']
+        started = time.perf_counter()
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as stream:
+                result = import_manifest(
+                    stream,
+                    format=options['format'] or guess_format(path),
+                    created_by=created_by,
+                    chunk_size=options['chunk_size'],
+                    dry_run=options['dry_run'],
+                )
+        except OSError as error:
+            raise CommandError(str(error))
+        elapsed = time.perf_counter() - started
+
+        for error in result.errors[:50]:
+            self.stderr.write(f"line {error.line}: {error.message}")
+        if len(result.errors) > 50:
+            self.stderr.write(f"... {len(result.errors) - 50} more errors")
+        if result.failure:
+            committed = (
+                f"lines up to {result.committed_through} are saved, resume after it"
+                if result.committed_through else "nothing was saved"
+            )
+            self.stderr.write(self.style.ERROR(f"Import stopped: {result.failure}; {committed}"))
+        verb = "valid" if options['dry_run'] else "imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.created} shipments {verb}, {len(result.errors)} rows rejected in {elapsed:.1f}s"
+        ))
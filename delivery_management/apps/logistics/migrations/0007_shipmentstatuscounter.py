@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0006_shipment_updated_at_alter_shipment_status_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShipmentStatusCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20, unique=True)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Compteur de statut',
+                'verbose_name_plural': 'Compteurs de statuts',
+            },
+        ),
+    ]
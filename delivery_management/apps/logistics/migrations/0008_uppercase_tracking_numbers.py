@@ -0,0 +1,18 @@
+from django.db import migrations
+from django.db.models.functions import Upper
+
+
+def uppercase_tracking_numbers(apps, schema_editor):
+    Shipment = apps.get_model('logistics', 'Shipment')
+    Shipment.objects.update(tracking_number=Upper('tracking_number'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0007_shipmentstatuscounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(uppercase_tracking_numbers, migrations.RunPython.noop),
+    ]
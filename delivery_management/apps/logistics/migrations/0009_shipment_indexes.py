@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0001_initial'),
+        ('logistics', '0008_uppercase_tracking_numbers'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['status', 'created_at'], name='shipment_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['id_client', 'created_at'], name='shipment_client_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['created_at'], name='shipment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipmentstatushistory',
+            index=models.Index(fields=['shipment', 'changed_at'], name='history_shipment_changed_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:15
+
+from django.db import migrations, models
+
+from apps.core.search import create_search_index, drop_search_index
+
+
+def build_search_documents(apps, schema_editor):
+    Shipment = apps.get_model('logistics', 'Shipment')
+    rows = Shipment.objects.values_list(
+        'pk', 'tracking_number', 'id_client__name', 'id_destination__ville', 'description'
+    )
+    shipments = [
+        Shipment(pk=pk, search_document=' '.join(part for part in parts if part))
+        for pk, *parts in rows.iterator()
+    ]
+    Shipment.objects.bulk_update(shipments, ['search_document'], batch_size=500)
+    create_search_index(schema_editor, Shipment._meta.db_table)
+
+
+def drop_search_documents(apps, schema_editor):
+    drop_search_index(schema_editor, apps.get_model('logistics', 'Shipment')._meta.db_table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0009_shipment_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipment',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(build_search_documents, drop_search_documents),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0011_scanbatch_history_changed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipment',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
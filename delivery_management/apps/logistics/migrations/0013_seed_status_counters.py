@@ -0,0 +1,22 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def seed_status_counters(apps, schema_editor):
+    Shipment = apps.get_model('logistics', 'Shipment')
+    ShipmentStatusCounter = apps.get_model('logistics', 'ShipmentStatusCounter')
+    counts = {status: 0 for status, _ in Shipment._meta.get_field('status').choices}
+    counts.update(Shipment.objects.order_by().values_list('status').annotate(n=Count('id')))
+    for status, count in counts.items():
+        ShipmentStatusCounter.objects.update_or_create(status=status, defaults={'count': count})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0012_shipment_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_status_counters, migrations.RunPython.noop),
+    ]
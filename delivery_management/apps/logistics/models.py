@@ -1,9 +1,12 @@
+from collections import Counter
 from decimal import Decimal
-import uuid
 from django import forms
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from apps.clients.models import Client
+from apps.core.identifiers import allocate, insert_with_retry, new_identifier
 from django.conf import settings
 
 
@@ -89,6 +92,138 @@ class Tournee(models.Model):
         return f"Tournée {self.date}"
 
 
+# Attempts of Shipment.transition_to() after losing a race to another writer
+TRANSITION_RETRIES = 3
+
+
+class StatusConflict(Exception):
+    """A concurrent write changed the shipment and the transition no longer applies"""
+
+    def __init__(self, shipment, new_status):
+        self.shipment = shipment
+        self.new_status = new_status
+        super().__init__(
+            f"{shipment.tracking_number}: statut {shipment.status} (version {shipment.version}), "
+            f"transition vers {new_status} impossible"
+        )
+
+
+class RowsChanged(Exception):
+    """An UPDATE matched fewer rows than expected (used to roll back to a savepoint)"""
+
+
+class ShipmentQuerySet(models.QuerySet):
+    # Keep IN (...) lists below the SQLite bound-parameter limit
+    BATCH_SIZE = 500
+
+    def update_if_unchanged(self, expected, **changes):
+        """Apply `changes` to the shipments of `expected` ({pk: (status, version)}) still in that state.
+
+        No row is locked: there is one UPDATE per (status, version) and batch,
+        conditioned on both. When an UPDATE matches fewer rows than its batch
+        (another writer got there first), it is rolled back and the batch is
+        updated row by row to know which ones moved. Must run in a
+        transaction; returns the set of pks updated.
+        """
+        groups = {}
+        for pk, state in expected.items():
+            groups.setdefault(state, []).append(pk)
+        updated = set()
+        for (status, version), pks in groups.items():
+            for start in range(0, len(pks), self.BATCH_SIZE):
+                batch = pks[start:start + self.BATCH_SIZE]
+                same_state = self.model.objects.filter(status=status, version=version)
+                try:
+                    with transaction.atomic():
+                        if same_state.filter(pk__in=batch).update(**changes) != len(batch):
+                            raise RowsChanged
+                    updated.update(batch)
+                except RowsChanged:
+                    updated.update(pk for pk in batch if same_state.filter(pk=pk).update(**changes))
+        return updated
+
+    def transition(self, new_status, changed_by=None, notes=None, location='', retries=TRANSITION_RETRIES):
+        """Move every shipment allowed by STATUS_WORKFLOW to reach `new_status`.
+
+        The shipments are read without locks and moved with conditional
+        UPDATEs (update_if_unchanged); the history rows, the counters and the
+        dashboard rollups are written for the shipments actually moved, in the
+        same transaction. Shipments changed by another writer in between are
+        read again and retried (up to `retries` times) if the workflow still
+        allows the transition. Shipments whose status does not allow it are
+        left untouched. Returns the number of shipments moved.
+        """
+        from apps.core.cache import invalidate_tags
+        from .counters import adjust_status_counters
+        from .signals import shipment_statuses_changed
+        from .tracking import invalidate_tracking_timelines
+
+        model = self.model
+        from_statuses = [
+            status for status, allowed in model.STATUS_WORKFLOW.items() if new_status in allowed
+        ]
+        if notes is None:
+            notes = model.STATUS_NOTES.get(new_status, '')
+
+        def read(queryset):
+            return {
+                pk: row for pk, *row in queryset.filter(status__in=from_statuses).values_list(
+                    'pk', 'status', 'version', 'tracking_number', 'created_at', 'created_by_id'
+                )
+            }
+
+        candidates = read(self)
+        moved = []
+        for _ in range(retries + 1):
+            if not candidates:
+                break
+            now = timezone.now()
+            changes = {'status': new_status, 'updated_at': now, 'version': models.F('version') + 1}
+            if new_status == 'DELIVERED':
+                changes['reel_delivery_date'] = Coalesce('reel_delivery_date', Value(now.date()))
+            with transaction.atomic():
+                updated = self.update_if_unchanged(
+                    {pk: (status, version) for pk, (status, version, *_) in candidates.items()}, **changes
+                )
+                rows = [candidates[pk] for pk in candidates if pk in updated]
+                ShipmentStatusHistory.objects.bulk_create([
+                    ShipmentStatusHistory(
+                        shipment_id=pk,
+                        status=new_status,
+                        changed_by=changed_by,
+                        location=location,
+                        notes=notes,
+                    )
+                    for pk in candidates if pk in updated
+                ], batch_size=self.BATCH_SIZE)
+                if rows:
+                    deltas = Counter()
+                    for old_status, *_ in rows:
+                        deltas[old_status] -= 1
+                    deltas[new_status] += len(rows)
+                    adjust_status_counters(deltas)
+                    shipment_statuses_changed.send(sender=model, changes=[
+                        (created_at, created_by_id, old_status, new_status)
+                        for old_status, _, _, created_at, created_by_id in rows
+                    ])
+            moved.extend(rows)
+            # Lost races: read those shipments again, keep the ones that can still move
+            lost = [pk for pk in candidates if pk not in updated]
+            candidates = {}
+            for start in range(0, len(lost), self.BATCH_SIZE):
+                candidates.update(read(model.objects.filter(pk__in=lost[start:start + self.BATCH_SIZE])))
+
+        if moved:
+            invalidate_tracking_timelines([row[2] for row in moved])
+            invalidate_tags('shipments')
+        return len(moved)
+
+    def search(self, query):
+        """Shipments whose search document matches every term of `query`"""
+        from apps.core.search import get_search_backend
+        return get_search_backend(self.model).filter(self, query)
+
+
 class Shipment(models.Model):
     tracking_number = models.CharField(max_length=30, unique=True, editable=False)
     id_client = models.ForeignKey(Client, on_delete=models.CASCADE, null=True, blank=True)
@@ -122,6 +257,19 @@ class Shipment(models.Model):
         'DELIVERED': [],
         'FAILED': ['OUT_FOR_DELIVERY'],  # Retry allowed
     }
+
+    # Tracking numbers: EXP-<time><sequence><check>, see apps/core/identifiers.py
+    TRACKING_PREFIX = 'EXP'
+
+    # Default history notes for each status
+    STATUS_NOTES = {
+        'REGISTERED': 'Expédition enregistrée',
+        'TRANSIT': 'Colis pris en charge par le transporteur',
+        'SORTING': 'Colis arrivé au centre de tri',
+        'OUT_FOR_DELIVERY': 'Colis en cours de livraison',
+        'DELIVERED': 'Colis livré avec succès',
+        'FAILED': 'Échec de livraison',
+    }
     
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -136,33 +284,161 @@ class Shipment(models.Model):
         default='REGISTERED'
     )
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, blank=True)
+    # Bumped by every status change: conditional updates compare it (optimistic concurrency)
+    version = models.PositiveIntegerField(default=0, editable=False)
+    # Tracking number, client, destination and description, indexed for search
+    search_document = models.TextField(blank=True, default='', editable=False)
+
+    objects = ShipmentQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Expédition"
         verbose_name_plural = "Expéditions"
+        indexes = [
+            # Hot filters of expedition_list, all paginated on created_at
+            models.Index(fields=['status', 'created_at'], name='shipment_status_created_idx'),
+            models.Index(fields=['id_client', 'created_at'], name='shipment_client_created_idx'),
+            models.Index(fields=['created_at'], name='shipment_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.tracking_number}"
 
     def calculate_total(self):
-        if self.id_destination and self.id_service_type:
-            # Prix de base depuis la zone de la destination
-            base = 0
-            if self.id_destination.zone:
-                base = self.id_destination.zone.base_price or 0
-            weight_rate = self.id_service_type.weight_rate or 0
-            volume_rate = self.id_service_type.volume_rate or 0
-            weight = self.weight or 0
-            volume = self.volume or 0
-            return Decimal(base) + Decimal(weight) * Decimal(weight_rate) + Decimal(volume) * Decimal(volume_rate)
+        if self.id_destination_id and self.id_service_type_id:
+            # Prix de base de la zone + tarifs du service, depuis la table des tarifs en mémoire
+            from .pricing import quote
+            return quote(self.id_destination_id, self.id_service_type_id, self.weight, self.volume).total
         return Decimal('0.00')
 
+    def build_search_document(self):
+        parts = [self.tracking_number]
+        if self.id_client_id:
+            parts.append(self.id_client.name)
+        if self.id_destination_id:
+            parts.append(self.id_destination.ville)
+        parts.append(self.description or '')
+        return ' '.join(part for part in parts if part)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the status as loaded, so status changes can be detected without a query
+        if 'status' in instance.__dict__:
+            instance._loaded_status = instance.status
+        return instance
+
+    @classmethod
+    def new_tracking_number(cls):
+        return new_identifier(cls.TRACKING_PREFIX)
+
+    @classmethod
+    def new_tracking_numbers(cls, count):
+        """Block of `count` increasing tracking numbers, for bulk inserts"""
+        return allocate(cls.TRACKING_PREFIX, count)
+
     def save(self, *args, **kwargs):
-        if not self.tracking_number:
-            self.tracking_number = f"EXP-{uuid.uuid4().hex[:8].upper()}"
+        generated = not self.tracking_number
+        if generated:
+            self.tracking_number = self.new_tracking_number()
+        self.tracking_number = self.tracking_number.upper()
         self.total_price = self.calculate_total()
-        super().save(*args, **kwargs)
+
+        def insert():
+            self.search_document = self.build_search_document()
+            super(Shipment, self).save(*args, **kwargs)
+
+        update_fields = kwargs.get('update_fields')
+        bump_version = (
+            not self._state.adding
+            and self.status != getattr(self, '_loaded_status', None)
+            and (update_fields is None or 'status' in update_fields)
+        )
+        if bump_version:
+            # A status changed through save() invalidates pending conditional updates too
+            loaded_version = self.__dict__.get('version')
+            self.version = models.F('version') + 1
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'version'}
+
+        if generated:
+            # A generated number is replaced if it ever collides with an existing one
+            insert_with_retry(self, 'tracking_number', self.TRACKING_PREFIX, insert)
+        else:
+            insert()
+        if bump_version:
+            # The version written, without reading the row back; a deferred one is read on access
+            if loaded_version is None:
+                del self.__dict__['version']
+            else:
+                self.version = loaded_version + 1
+        self._loaded_status = self.status
     
+    def transition_to(self, new_status, changed_by=None, notes=None, location='', retries=TRANSITION_RETRIES):
+        """Move this shipment to `new_status`: one UPDATE and one history row, in a transaction.
+
+        Unlike save(), the history row is written once with its author, notes
+        and location, and post_save is not sent: the counters, the dashboard
+        rollups and the caches are updated here.
+
+        No row is locked: the UPDATE only matches if the row still has the
+        status and version this instance was read with. When another writer
+        got there first, the status and version are read again and the
+        transition retried (up to `retries` times) as long as the workflow
+        still allows it; otherwise StatusConflict is raised and nothing is
+        written. Raises ValueError if STATUS_WORKFLOW forbids the transition.
+        """
+        from apps.core.cache import invalidate_tags
+        from .counters import adjust_status_counters
+        from .signals import shipment_statuses_changed
+        from .tracking import invalidate_tracking_timelines
+
+        if not self.can_transition_to(new_status):
+            raise ValueError(f"Transition de {self.status} vers {new_status} non autorisée")
+        if notes is None:
+            notes = self.STATUS_NOTES.get(new_status, '')
+
+        for _ in range(retries + 1):
+            old_status, now = self.status, timezone.now()
+            changes = {'status': new_status, 'updated_at': now, 'version': models.F('version') + 1}
+            if new_status == 'DELIVERED':
+                changes['reel_delivery_date'] = Coalesce('reel_delivery_date', Value(now.date()))
+            with transaction.atomic():
+                updated = type(self).objects.filter(
+                    pk=self.pk, status=old_status, version=self.version
+                ).update(**changes)
+                if updated:
+                    ShipmentStatusHistory.objects.create(
+                        shipment=self,
+                        status=new_status,
+                        changed_by=changed_by,
+                        location=location,
+                        notes=notes,
+                    )
+                    adjust_status_counters({old_status: -1, new_status: 1})
+                    shipment_statuses_changed.send(sender=type(self), changes=[
+                        (self.created_at, self.created_by_id, old_status, new_status)
+                    ])
+            if updated:
+                break
+            # Lost the race: read the row again and retry if the workflow still allows it
+            self.refresh_from_db(fields=['status', 'version'])
+            self._loaded_status = self.status
+            if not self.can_transition_to(new_status):
+                raise StatusConflict(self, new_status)
+        else:
+            raise StatusConflict(self, new_status)
+
+        self.status = self._loaded_status = new_status
+        self.version += 1
+        self.updated_at = now
+        if new_status == 'DELIVERED' and 'reel_delivery_date' in self.__dict__:
+            # A deferred field will be read from the database when accessed
+            self.reel_delivery_date = self.reel_delivery_date or now.date()
+        invalidate_tracking_timelines([self.tracking_number])
+        invalidate_tags('shipments')
+        return True
+
     def can_transition_to(self, new_status):
         """Check if transition to new_status is allowed"""
         allowed = self.STATUS_WORKFLOW.get(self.status, [])
@@ -189,7 +465,8 @@ class ShipmentStatusHistory(models.Model):
     """Track all status changes for timeline"""
     shipment = models.ForeignKey(Shipment, on_delete=models.CASCADE, related_name='status_history')
     status = models.CharField(max_length=20, choices=Shipment.STATUS_CHOICES)
-    changed_at = models.DateTimeField(auto_now_add=True)
+    # Defaults to now; batch scans record the time the parcel was scanned
+    changed_at = models.DateTimeField(default=timezone.now)
     changed_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -203,7 +480,42 @@ class ShipmentStatusHistory(models.Model):
         verbose_name = "Historique de statut"
         verbose_name_plural = "Historiques de statuts"
         ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['shipment', 'changed_at'], name='history_shipment_changed_idx'),
+        ]
     
     def __str__(self):
         return f"{self.shipment.tracking_number} - {self.get_status_display()} ({self.changed_at})"
 
+
+class ShipmentStatusCounter(models.Model):
+    """Running number of shipments per status, kept in sync by signals"""
+    status = models.CharField(max_length=20, unique=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Compteur de statut"
+        verbose_name_plural = "Compteurs de statuts"
+
+    def __str__(self):
+        return f"{self.status}: {self.count}"
+
+
+class ScanBatch(models.Model):
+    """Idempotency key of a scan batch (see scans.py): a retried batch gets the stored response"""
+    key = models.CharField(max_length=100, unique=True)
+    response = models.JSONField(null=True, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Lot de scans"
+        verbose_name_plural = "Lots de scans"
+
+    def __str__(self):
+        return self.key
@@ -0,0 +1,26 @@
+"""HTML to PDF with WeasyPrint (optional dependency).
+
+Kept free of Django imports: the batch slips (slips.py) run html_to_pdf in
+worker processes started with 'spawn', which import this module only.
+"""
+
+
+def html_to_pdf(html, base_url=None):
+    """PDF bytes of an HTML document; raises ImportError without weasyprint"""
+    from weasyprint import HTML
+
+    return HTML(string=html, base_url=base_url).write_pdf()
+
+
+def merge_pdfs(documents):
+    """One PDF with the pages of every document, in order; raises ImportError without pypdf"""
+    from io import BytesIO
+
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for document in documents:
+        writer.append(BytesIO(document))
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
@@ -0,0 +1,142 @@
+"""Shipment pricing from an in-memory tariff table.
+
+price = zone base price of the destination
+      + weight × service weight rate
+      + volume × service volume rate
+
+Zone prices and service rates are small tables: each process keeps them in
+memory together with the destination → zone map, and reloads them when the
+tariff version stored in the 'tariffs' cache changes. Signals on Zone,
+TypeService and Destination bump that version (see signals.py), so a price
+preview no longer queries the database on every keystroke.
+"""
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+import threading
+import uuid
+
+from django.core.cache import caches
+
+from .models import Destination, TypeService, Zone
+
+TARIFF_VERSION_KEY = 'pricing:tariff_version'
+ZERO = Decimal('0')
+
+Quote = namedtuple('Quote', ['base_price', 'weight_cost', 'volume_cost', 'total'])
+
+
+def to_decimal(value):
+    """Weights and volumes arrive as floats (model) or strings (forms, query string).
+
+    Raises ValueError for text that is not a number and for infinity and NaN,
+    which have no price.
+    """
+    if not value:
+        return ZERO
+    try:
+        number = value if isinstance(value, Decimal) else Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"not a number: {value}")
+    if not number.is_finite():
+        raise ValueError(f"not a finite number: {value}")
+    return number
+
+
+def to_int(pk):
+    """Ids come from the query string as strings; unknown values price as 0"""
+    try:
+        return int(pk) if pk else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TariffTable:
+    def __init__(self, version):
+        self.version = version
+        self.zone_prices = dict(Zone.objects.values_list('pk', 'base_price'))
+        self.service_rates = {
+            pk: (weight_rate, volume_rate)
+            for pk, weight_rate, volume_rate in TypeService.objects.values_list(
+                'pk', 'weight_rate', 'volume_rate'
+            )
+        }
+        # Destinations are numerous: their zone is loaded on first use
+        self.destination_zones = {}
+
+    def load_destinations(self, destination_ids, batch_size=500):
+        """Load the zone of every unknown destination, batch_size ids per query"""
+        missing = list({pk for pk in destination_ids if pk and pk not in self.destination_zones})
+        for start in range(0, len(missing), batch_size):
+            self.destination_zones.update(
+                Destination.objects.filter(pk__in=missing[start:start + batch_size]).values_list('pk', 'zone_id')
+            )
+
+    def base_price(self, destination_id):
+        """Zone price of a destination already loaded by load_destinations()"""
+        zone_id = self.destination_zones.get(destination_id)
+        return self.zone_prices.get(zone_id) or ZERO
+
+    def rates(self, service_type_id):
+        if not service_type_id:
+            return ZERO, ZERO
+        weight_rate, volume_rate = self.service_rates.get(service_type_id, (ZERO, ZERO))
+        return weight_rate or ZERO, volume_rate or ZERO
+
+
+_tariffs = None
+_lock = threading.Lock()
+
+
+def tariff_version():
+    cache = caches['tariffs']
+    version = cache.get(TARIFF_VERSION_KEY)
+    if version is None:
+        cache.add(TARIFF_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(TARIFF_VERSION_KEY)
+    return version
+
+
+def bump_tariff_version():
+    """Invalidate the tariff tables of every process"""
+    caches['tariffs'].set(TARIFF_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def get_tariffs():
+    global _tariffs
+    version = tariff_version()
+    tariffs = _tariffs
+    if tariffs is None or tariffs.version != version:
+        with _lock:
+            if _tariffs is None or _tariffs.version != version:
+                _tariffs = TariffTable(version)
+            tariffs = _tariffs
+    return tariffs
+
+
+def quote(destination_id, service_type_id, weight=0, volume=0):
+    """Price of one shipment; a missing destination or service contributes 0"""
+    return quote_many([(destination_id, service_type_id, weight, volume)])[0]
+
+
+def quote_many(items):
+    """Price a batch of (destination_id, service_type_id, weight, volume) tuples.
+
+    The zones of all the destinations are loaded up front, so the whole
+    batch costs at most one query per 500 unknown destinations instead of
+    one round-trip per item. Returns the quotes in the order of `items`;
+    raises ValueError for a weight or volume that is not a finite number.
+    """
+    tariffs = get_tariffs()
+    items = [
+        (to_int(destination_id), to_int(service_type_id), weight, volume)
+        for destination_id, service_type_id, weight, volume in items
+    ]
+    tariffs.load_destinations(destination_id for destination_id, _, _, _ in items)
+    quotes = []
+    for destination_id, service_type_id, weight, volume in items:
+        weight_rate, volume_rate = tariffs.rates(service_type_id)
+        base_price = tariffs.base_price(destination_id)
+        weight_cost = to_decimal(weight) * weight_rate
+        volume_cost = to_decimal(volume) * volume_rate
+        quotes.append(Quote(base_price, weight_cost, volume_cost, base_price + weight_cost + volume_cost))
+    return quotes
@@ -0,0 +1,255 @@
+"""Batch ingestion of parcel scans from the sorting-center scanners (api/scans/).
+
+A batch is an NDJSON body (one event per line) or a JSON array of events:
+
+    {"tracking_number": "EXP-...", "status": "SORTING", "location": "Alger", "scanned_at": "2024-05-02T08:15:00Z"}
+
+Tracking numbers are resolved with one query per 500 numbers and each event
+is checked against Shipment.STATUS_WORKFLOW in batch order, so a parcel can
+move through several statuses in one batch. Accepted events are applied
+together: conditional UPDATEs per (final status, delivery date) group that
+only match parcels still in the status and version they were read with, the
+history rows of the parcels moved with bulk_create (dated scanned_at), then
+the counters, the dashboard rollups and the caches once per batch. Every
+event gets a result in the response, in the order received.
+
+A batch sent with an Idempotency-Key is stored with its response (ScanBatch):
+a scanner retrying after a timeout gets the same response back and no event
+is applied twice.
+"""
+from collections import Counter, namedtuple
+import json
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.core.cache import invalidate_tags
+from .counters import adjust_status_counters
+from .models import TRANSITION_RETRIES, ScanBatch, Shipment, ShipmentQuerySet, ShipmentStatusHistory
+from .signals import shipment_statuses_changed
+from .tracking import invalidate_tracking_timelines, normalize_tracking_number
+
+MAX_EVENTS = 5000
+
+ScanEvent = namedtuple('ScanEvent', ['tracking_number', 'status', 'location', 'scanned_at'])
+ScannedShipment = namedtuple('ScannedShipment', ['pk', 'status', 'version', 'created_at', 'created_by_id'])
+
+
+class ScanBatchError(ValueError):
+    """The body as a whole cannot be read (the events are not looked at)"""
+
+
+class ScanInProgress(Exception):
+    """Another request is still processing a batch with the same idempotency key"""
+
+
+def parse_events(body):
+    """Return the list of event dicts of an NDJSON or JSON array body"""
+    try:
+        text = body.decode('utf-8-sig') if isinstance(body, bytes) else body
+    except UnicodeDecodeError as error:
+        raise ScanBatchError(f"Body is not UTF-8: {error}")
+    text = text.strip()
+    if not text:
+        raise ScanBatchError("Empty batch")
+    try:
+        if text.startswith('['):
+            events = json.loads(text)
+        else:
+            events = [json.loads(line) for line in text.splitlines() if line.strip()]
+    except ValueError as error:
+        raise ScanBatchError(f"Invalid JSON: {error}")
+    if len(events) > MAX_EVENTS:
+        raise ScanBatchError(f"At most {MAX_EVENTS} events per batch")
+    return events
+
+
+def read_event(data, now):
+    """ScanEvent of an event dict; raises ValueError with the reason it is invalid"""
+    if not isinstance(data, dict):
+        raise ValueError("event must be an object")
+    tracking_number = normalize_tracking_number(str(data.get('tracking_number') or ''))
+    if not tracking_number:
+        raise ValueError("tracking_number required")
+    status = data.get('status') or data.get('new_status')
+    if not isinstance(status, str) or status not in dict(Shipment.STATUS_CHOICES):
+        raise ValueError(f"unknown status '{status}'")
+    scanned_at = now
+    if data.get('scanned_at'):
+        scanned_at = parse_datetime(str(data['scanned_at']))
+        if scanned_at is None:
+            raise ValueError(f"invalid scanned_at '{data['scanned_at']}'")
+        if timezone.is_naive(scanned_at):
+            scanned_at = timezone.make_aware(scanned_at)
+    return ScanEvent(tracking_number, status, str(data.get('location') or '')[:255], scanned_at)
+
+
+def load_shipments(tracking_numbers):
+    """{tracking number: ScannedShipment} (read without locks, see apply_scans)"""
+    numbers = list(tracking_numbers)
+    shipments = {}
+    for start in range(0, len(numbers), ShipmentQuerySet.BATCH_SIZE):
+        rows = Shipment.objects.filter(
+            tracking_number__in=numbers[start:start + ShipmentQuerySet.BATCH_SIZE]
+        ).values_list('tracking_number', 'pk', 'status', 'version', 'created_at', 'created_by_id')
+        for tracking_number, *row in rows:
+            shipments[tracking_number] = ScannedShipment(*row)
+    return shipments
+
+
+def check_events(parsed, shipments):
+    """Check the events against STATUS_WORKFLOW in batch order.
+
+    Returns ({index: result}, {tracking number: [applied events]}): a parcel
+    may move through several statuses in one batch.
+    """
+    current = {number: shipment.status for number, shipment in shipments.items()}
+    results = {}
+    applied = {}
+    for index, event in parsed:
+        result = {'index': index, 'tracking_number': event.tracking_number}
+        status = current.get(event.tracking_number)
+        if status is None:
+            result.update(result='rejected', error="unknown tracking number")
+        elif event.status not in Shipment.STATUS_WORKFLOW.get(status, []):
+            result.update(result='rejected', error=f"transition {status} -> {event.status} not allowed")
+        else:
+            current[event.tracking_number] = event.status
+            applied.setdefault(event.tracking_number, []).append(event)
+            result.update(result='applied', status=event.status)
+        results[index] = result
+    return results, applied
+
+
+def apply_scans(events, changed_by=None, retries=TRANSITION_RETRIES):
+    """Validate and apply a list of event dicts; return the per-event results.
+
+    No row is locked: each parcel is moved with an UPDATE conditioned on the
+    status and version it was read with (ShipmentQuerySet.update_if_unchanged),
+    and its history rows are only written if that UPDATE matched. The events
+    of a parcel changed by another writer in between are checked again against
+    its new status (up to `retries` times), then rejected.
+    """
+    now = timezone.now()
+    results = []
+    pending = []
+    for index, data in enumerate(events):
+        try:
+            pending.append((index, read_event(data, now)))
+            results.append(None)
+        except ValueError as error:
+            results.append({'index': index, 'result': 'rejected', 'error': str(error)})
+
+    moved_numbers = []
+    for _ in range(retries + 1):
+        if not pending:
+            break
+        shipments = load_shipments({event.tracking_number for _, event in pending})
+        checked, applied = check_events(pending, shipments)
+        with transaction.atomic():
+            groups = {}
+            for number, scans in applied.items():
+                shipment = shipments[number]
+                delivered = [event for event in scans if event.status == 'DELIVERED']
+                delivery_date = timezone.localdate(delivered[-1].scanned_at) if delivered else None
+                groups.setdefault((scans[-1].status, delivery_date), {})[shipment.pk] = (
+                    shipment.status, shipment.version
+                )
+            updated = set()
+            for (final, delivery_date), expected in groups.items():
+                changes = {'status': final, 'updated_at': now, 'version': F('version') + 1}
+                if delivery_date:
+                    changes['reel_delivery_date'] = Coalesce('reel_delivery_date', Value(delivery_date))
+                updated |= Shipment.objects.update_if_unchanged(expected, **changes)
+
+            moved = {number: scans for number, scans in applied.items() if shipments[number].pk in updated}
+            ShipmentStatusHistory.objects.bulk_create([
+                ShipmentStatusHistory(
+                    shipment_id=shipments[number].pk,
+                    status=event.status,
+                    changed_at=event.scanned_at,
+                    changed_by=changed_by,
+                    location=event.location,
+                    notes=Shipment.STATUS_NOTES.get(event.status, ''),
+                )
+                for number, scans in moved.items() for event in scans
+            ], batch_size=ShipmentQuerySet.BATCH_SIZE)
+            # Parcels whose status differs at the end of the batch (a FAILED -> OUT_FOR_DELIVERY
+            # -> FAILED round trip only adds history rows)
+            changed = [
+                (shipments[number], scans[-1].status) for number, scans in moved.items()
+                if scans[-1].status != shipments[number].status
+            ]
+            if changed:
+                deltas = Counter()
+                for shipment, final in changed:
+                    deltas[shipment.status] -= 1
+                    deltas[final] += 1
+                adjust_status_counters(deltas)
+                shipment_statuses_changed.send(sender=Shipment, changes=[
+                    (shipment.created_at, shipment.created_by_id, shipment.status, final)
+                    for shipment, final in changed
+                ])
+
+        moved_numbers.extend(moved)
+        # Events of the parcels changed concurrently are checked again; the others are final
+        lost = set(applied) - set(moved)
+        for index, event in pending:
+            if event.tracking_number not in lost:
+                results[index] = checked[index]
+        pending = [(index, event) for index, event in pending if event.tracking_number in lost]
+
+    for index, event in pending:
+        results[index] = {
+            'index': index,
+            'tracking_number': event.tracking_number,
+            'result': 'rejected',
+            'error': "shipment changed concurrently, scan again",
+        }
+
+    if moved_numbers:
+        invalidate_tracking_timelines(moved_numbers)
+        invalidate_tags('shipments')
+    return results
+
+
+def summarize(results):
+    applied = sum(1 for result in results if result['result'] == 'applied')
+    return {
+        'success': True,
+        'applied': applied,
+        'rejected': len(results) - applied,
+        'results': results,
+    }
+
+
+def ingest_scans(body, changed_by=None, idempotency_key=None):
+    """Parse and apply a scan batch; return the response dict.
+
+    With an idempotency key the key is claimed in the same transaction as the
+    batch: a retry of a committed batch returns the stored response, a retry
+    racing an unfinished one raises ScanInProgress.
+    """
+    events = parse_events(body)
+    if not idempotency_key:
+        return summarize(apply_scans(events, changed_by))
+
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                batch = ScanBatch.objects.create(key=idempotency_key, created_by=changed_by)
+        except IntegrityError:
+            batch = None
+        if batch is not None:
+            batch.response = summarize(apply_scans(events, changed_by))
+            batch.save(update_fields=['response'])
+            return batch.response
+
+    # Key already used: answer like the first time
+    stored = ScanBatch.objects.filter(key=idempotency_key).values_list('response', flat=True).first()
+    if stored is None:
+        raise ScanInProgress(idempotency_key)
+    return stored
@@ -1,21 +1,41 @@
-from django.db.models.signals import post_save, pre_save
-from django.dispatch import receiver
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
 from django.utils import timezone
-from .models import Shipment, ShipmentStatusHistory, Tour
+from apps.clients.models import Client
+from apps.core.cache import invalidate_on
+from apps.core.search import get_search_backend, refresh_documents, reindex
+from .counters import adjust_status_counters
+from .models import Destination, Driver, Shipment, ShipmentStatusHistory, Tour, TypeService, Zone
+from .pricing import bump_tariff_version
+from .tracking import invalidate_tracking_timelines
+
+# Sent by the bulk paths that bypass post_save (ShipmentQuerySet.transition, the importer)
+# with changes=[(created_at, created_by_id, old status or None, new status), ...]
+shipment_statuses_changed = Signal()
+
+# Cached pages and lookups (apps/core/cache.py) depending on these models
+invalidate_on(Shipment, 'shipments')
+invalidate_on(Destination, 'destinations')
+invalidate_on(Driver, 'drivers')
+# Rows printed on the shipping slips besides the shipment (slips.py)
+for model in (Client, Destination, Zone, TypeService, Tour, Driver):
+    invalidate_on(model, 'slips')
 
 
 # Store the old status before save
 @receiver(pre_save, sender=Shipment)
 def store_old_status(sender, instance, **kwargs):
     """Store the old status to compare after save"""
-    if instance.pk:
-        try:
-            old_instance = Shipment.objects.get(pk=instance.pk)
-            instance._old_status = old_instance.status
-        except Shipment.DoesNotExist:
-            instance._old_status = None
-    else:
+    if not instance.pk:
         instance._old_status = None
+    elif hasattr(instance, '_loaded_status'):
+        # Tracked since the instance was loaded (see Shipment.from_db), no query needed
+        instance._old_status = instance._loaded_status
+    else:
+        # Not loaded from the database (or status deferred): read it
+        instance._old_status = Shipment.objects.filter(pk=instance.pk).values_list(
+            'status', flat=True
+        ).first()
 
 
 @receiver(post_save, sender=Shipment)
@@ -33,18 +53,10 @@ def create_status_history(sender, instance, created, **kwargs):
         old_status = getattr(instance, '_old_status', None)
         if old_status and old_status != instance.status:
             # Status changed - create history entry
-            status_notes = {
-                'REGISTERED': 'Expédition enregistrée',
-                'TRANSIT': 'Colis pris en charge par le transporteur',
-                'SORTING': 'Colis arrivé au centre de tri',
-                'OUT_FOR_DELIVERY': 'Colis en cours de livraison',
-                'DELIVERED': 'Colis livré avec succès',
-                'FAILED': 'Échec de livraison',
-            }
             ShipmentStatusHistory.objects.create(
                 shipment=instance,
                 status=instance.status,
-                notes=status_notes.get(instance.status, '')
+                notes=Shipment.STATUS_NOTES.get(instance.status, '')
             )
             
             # Auto-update delivery date when delivered
@@ -54,18 +66,79 @@ def create_status_history(sender, instance, created, **kwargs):
                 )
 
 
+@receiver(post_save, sender=Shipment)
+def update_status_counters(sender, instance, created, **kwargs):
+    """Keep the per-status counters in sync with the saved shipment"""
+    if created:
+        adjust_status_counters({instance.status: 1})
+    else:
+        old_status = getattr(instance, '_old_status', None)
+        if old_status and old_status != instance.status:
+            adjust_status_counters({old_status: -1, instance.status: 1})
+
+
+@receiver(post_delete, sender=Shipment)
+def decrement_status_counter(sender, instance, **kwargs):
+    """Remove a deleted shipment from the per-status counters"""
+    adjust_status_counters({instance.status: -1})
+
+
+@receiver(post_save, sender=Shipment)
+@receiver(post_delete, sender=Shipment)
+def invalidate_shipment_timeline(sender, instance, **kwargs):
+    """Drop the cached public tracking timeline of the shipment"""
+    invalidate_tracking_timelines([instance.tracking_number])
+
+
+@receiver(post_save, sender=Shipment)
+def index_shipment(sender, instance, **kwargs):
+    """Push the search document built in Shipment.save() to the search index"""
+    reindex(Shipment, [instance])
+
+
+@receiver(post_delete, sender=Shipment)
+def unindex_shipment(sender, instance, **kwargs):
+    get_search_backend(Shipment).remove(Shipment, [instance.pk])
+
+
+@receiver(post_save, sender=Client)
+def refresh_client_shipment_documents(sender, instance, created, **kwargs):
+    """The client name is part of the search document of its shipments"""
+    if not created:
+        refresh_documents(
+            Shipment.objects.filter(id_client=instance).select_related('id_client', 'id_destination')
+        )
+
+
+@receiver(post_save, sender=Destination)
+def refresh_destination_shipment_documents(sender, instance, created, **kwargs):
+    """The destination city is part of the search document of its shipments"""
+    if not created:
+        refresh_documents(
+            Shipment.objects.filter(id_destination=instance).select_related('id_client', 'id_destination')
+        )
+
+
+@receiver(post_save, sender=ShipmentStatusHistory)
+@receiver(post_delete, sender=ShipmentStatusHistory)
+def invalidate_history_timeline(sender, instance, **kwargs):
+    """A new or edited history entry changes the public tracking timeline"""
+    if ShipmentStatusHistory.shipment.is_cached(instance):
+        tracking_number = instance.shipment.tracking_number
+    else:
+        tracking_number = Shipment.objects.filter(pk=instance.shipment_id).values_list(
+            'tracking_number', flat=True
+        ).first()
+    if tracking_number:
+        invalidate_tracking_timelines([tracking_number])
+
+
 @receiver(post_save, sender=Tour)
 def update_shipments_on_tour_start(sender, instance, **kwargs):
     """When a tour starts, update related shipments to TRANSIT"""
     if instance.status == 'in_progress':
-        # Get all shipments in this tour that are still REGISTERED
-        shipments = Shipment.objects.filter(
-            id_tour=instance,
-            status='REGISTERED'
-        )
-        for shipment in shipments:
-            shipment.status = 'TRANSIT'
-            shipment.save()
+        # REGISTERED shipments of this tour go to TRANSIT in one bulk update
+        Shipment.objects.filter(id_tour=instance).transition('TRANSIT')
 
 
 @receiver(post_save, sender=Tour)
@@ -73,10 +146,21 @@ def update_shipments_on_tour_complete(sender, instance, **kwargs):
     """When tour completes, check for undelivered packages"""
     if instance.status == 'completed':
         # Shipments still in transit should move to sorting
-        shipments = Shipment.objects.filter(
-            id_tour=instance,
-            status='TRANSIT'
-        )
-        for shipment in shipments:
-            shipment.status = 'SORTING'
-            shipment.save()
+        Shipment.objects.filter(id_tour=instance).transition('SORTING')
+
+
+@receiver(post_save, sender=Zone)
+@receiver(post_delete, sender=Zone)
+@receiver(post_save, sender=TypeService)
+@receiver(post_delete, sender=TypeService)
+@receiver(post_delete, sender=Destination)
+def invalidate_tariffs(sender, **kwargs):
+    """Prices or zones changed: every process reloads its tariff table"""
+    bump_tariff_version()
+
+
+@receiver(post_save, sender=Destination)
+def invalidate_destination_tariff(sender, instance, created, **kwargs):
+    """A new destination is loaded on first use; an edited one may have changed zone"""
+    if not created:
+        bump_tariff_version()
@@ -0,0 +1,159 @@
+"""Shipping slips (bons d'expédition) as PDF, cached on disk.
+
+The rendered PDF is kept under SLIP_CACHE_DIR as
+<pk>-<updated_at>-<slips tag version>.pdf: an unchanged slip is served from
+the file instead of running WeasyPrint again. Every write to a shipment
+(save(), transition_to(), the scan batches) moves updated_at; the slip also
+shows the client, destination, zone, service, tour and driver, whose saves
+invalidate the 'slips' cache tag (signals.py). Either one changes the key;
+the older files of the shipment are removed when the new one is stored.
+
+Batch slips (every shipment of a tour, or the expedition_list filters) are
+one PDF with a page per shipment: the cached slips are reused, the missing
+ones are rendered in a process pool (SLIP_WORKERS) and stored, then the pages
+are merged with pypdf. Batches of more than INLINE_SLIPS shipments are
+rendered by a background job (apps/jobs). Without pypdf the batch is rendered as one WeasyPrint
+document; without weasyprint the views fall back to a printable HTML page.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import multiprocessing
+import os
+from pathlib import Path
+import tempfile
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from apps.core.cache import tag_versions
+from .models import Shipment
+from .pdf import html_to_pdf, merge_pdfs
+
+SLIP_RELATED = ('id_client', 'id_destination__zone', 'id_service_type', 'id_tour__id_driver')
+
+# Largest batch of slips in one PDF
+MAX_BATCH = 1000
+
+# Larger batches are rendered by a background job (tasks.py) instead of in the request
+INLINE_SLIPS = 50
+
+# Below this many slips to render, starting the worker processes costs more than it saves
+POOL_MIN_SLIPS = 8
+
+
+def slip_queryset(queryset=None):
+    """Shipments with the rows a slip shows"""
+    if queryset is None:
+        queryset = Shipment.objects.all()
+    return queryset.select_related(*SLIP_RELATED)
+
+
+def slip_path(shipment):
+    directory = Path(settings.SLIP_CACHE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    version = round(shipment.updated_at.timestamp() * 1_000_000)
+    related_version, = tag_versions(['slips'])
+    return directory / f"{shipment.pk}-{version}-{related_version}.pdf"
+
+
+def read_cached_slip(shipment):
+    try:
+        return slip_path(shipment).read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def store_slip(shipment, pdf):
+    """Write the slip atomically and drop the files of older versions"""
+    path = slip_path(shipment)
+    fd, temporary = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as output:
+        output.write(pdf)
+    os.replace(temporary, path)
+    for old in path.parent.glob(f"{shipment.pk}-*.pdf"):
+        if old != path:
+            old.unlink(missing_ok=True)
+
+
+def render_slip_html(shipment):
+    return render_to_string('logistics/expedition_pdf.html', {
+        'expedition': shipment,
+        'generated_at': timezone.now(),
+    })
+
+
+def slip_pdf(shipment, base_url=None):
+    """PDF of one slip; raises ImportError without weasyprint"""
+    pdf = read_cached_slip(shipment)
+    if pdf is None:
+        pdf = html_to_pdf(render_slip_html(shipment), base_url)
+        store_slip(shipment, pdf)
+    return pdf
+
+
+def render_slips(shipments, base_url=None):
+    """PDFs of `shipments`, in order, rendered by up to SLIP_WORKERS processes.
+
+    The templates are rendered here (they read the database); the workers
+    only get HTML strings, and are started with 'spawn' so they do not
+    inherit the database connections.
+    """
+    documents = [render_slip_html(shipment) for shipment in shipments]
+    if len(documents) < POOL_MIN_SLIPS:
+        return [html_to_pdf(document, base_url) for document in documents]
+    workers = min(settings.SLIP_WORKERS or os.cpu_count() or 1, len(documents))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return list(pool.map(
+            html_to_pdf, documents, repeat(base_url), chunksize=max(1, len(documents) // (workers * 4))
+        ))
+
+
+def batch_html(shipments, **context):
+    return render_to_string('logistics/expedition_slips.html', {
+        'expeditions': shipments,
+        'generated_at': timezone.now(),
+        **context,
+    })
+
+
+def batch_pdf(shipments, base_url=None, title=''):
+    """One PDF with the slip of each shipment, in order; raises ImportError without weasyprint"""
+    import weasyprint  # noqa: F401 (fail before rendering anything)
+
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        return html_to_pdf(batch_html(shipments, title=title), base_url)
+
+    pdfs = {}
+    missing = []
+    for shipment in shipments:
+        pdf = read_cached_slip(shipment)
+        if pdf is None:
+            missing.append(shipment)
+        else:
+            pdfs[shipment.pk] = pdf
+    for shipment, pdf in zip(missing, render_slips(missing, base_url)):
+        store_slip(shipment, pdf)
+        pdfs[shipment.pk] = pdf
+    return merge_pdfs([pdfs[shipment.pk] for shipment in shipments])
+
+
+def batch_document(shipments, base_url=None, title='', back_url=''):
+    """(content, extension) of a batch: the PDF, or the printable HTML page without weasyprint"""
+    try:
+        return batch_pdf(shipments, base_url, title), 'pdf'
+    except ImportError:
+        return batch_html(shipments, title=title, back_url=back_url, print_mode=True).encode(), 'html'
+
+
+def slips_response(request, shipments, filename, title, back_url):
+    """The batch of `shipments` rendered in the request (PDF inline, or the printable page)"""
+    content, extension = batch_document(shipments, request.build_absolute_uri('/'), title, back_url)
+    if extension == 'html':
+        return HttpResponse(content)
+    response = HttpResponse(content, content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename="{filename}.pdf"'
+    return response
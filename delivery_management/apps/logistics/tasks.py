@@ -0,0 +1,47 @@
+"""Background jobs of the logistics app (apps/jobs/queue.py)"""
+from apps.core.export import write_queryset_csv
+from apps.jobs.queue import task
+from .models import Shipment, ShipmentQuerySet
+from .slips import MAX_BATCH, batch_document, slip_queryset
+
+# Larger CSV exports are written by export_expeditions instead of streamed by the request
+INLINE_EXPORT_ROWS = 20000
+
+
+def store_slips(job, stem, shipments, base_url=None, title='', back_url=''):
+    """Render the batch of `shipments` into the job's output; returns the job result"""
+    content, extension = batch_document(shipments, base_url, title, back_url)
+    filename = f'{stem}.{extension}'
+    job.output_path(filename).write_bytes(content)
+    return {'file': filename, 'count': len(shipments)}
+
+
+@task('logistics.export_expeditions')
+def export_expeditions(job, params):
+    """CSV export of the expedition_list filters"""
+    from .views import expedition_export
+
+    header, rows, row = expedition_export(params)
+    count = write_queryset_csv(job.output_path('expeditions.csv'), header, rows, row=row, bom=True)
+    return {'file': 'expeditions.csv', 'rows': count}
+
+
+@task('logistics.expedition_slips')
+def expedition_slips(job, params, base_url=None, back_url=''):
+    """Slips of the expedition_list filters, one PDF"""
+    from .views import filter_expeditions
+
+    expeditions, _ = filter_expeditions(slip_queryset(), params)
+    shipments = list(expeditions.order_by('-created_at', '-pk')[:MAX_BATCH])
+    return store_slips(job, 'bons_expedition', shipments, base_url, 'Expéditions', back_url)
+
+
+@task('logistics.transition_shipments')
+def transition_shipments(job, shipment_ids, status, notes=None):
+    """Move the given shipments to `status` (those the workflow allows), by batches"""
+    moved = 0
+    for start in range(0, len(shipment_ids), ShipmentQuerySet.BATCH_SIZE):
+        moved += Shipment.objects.filter(
+            pk__in=shipment_ids[start:start + ShipmentQuerySet.BATCH_SIZE]
+        ).transition(status, changed_by=job.created_by, notes=notes)
+    return {'moved': moved, 'requested': len(shipment_ids)}
@@ -1,3 +1,134 @@
-from django.test import TestCase
+import threading
+from unittest import skipIf
 
-# Create your tests here.
+from django.db import connection, connections
+from django.test import TransactionTestCase
+
+from .counters import status_counts
+from .models import Shipment, ShipmentStatusHistory, StatusConflict
+from .scans import apply_scans
+
+
+@skipIf(
+    connection.vendor == 'sqlite' and connection.is_in_memory_db(),
+    "needs a file (WAL) SQLite test database or PostgreSQL",
+)
+class ConcurrentTransitionTests(TransactionTestCase):
+    """Threads racing on the same shipment through Shipment.transition_to()"""
+    THREADS = 8
+
+    def run_threads(self, target):
+        """Start THREADS threads on target(index) together; return what each returned or raised"""
+        barrier = threading.Barrier(self.THREADS)
+        outcomes = [None] * self.THREADS
+
+        def run(index):
+            try:
+                barrier.wait()
+                outcomes[index] = target(index)
+            except Exception as error:
+                outcomes[index] = error
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_one_winner_when_all_read_the_same_status(self):
+        shipment = Shipment.objects.create()
+        # Every thread holds an instance read before any of them writes
+        copies = [Shipment.objects.get(pk=shipment.pk) for _ in range(self.THREADS)]
+
+        outcomes = self.run_threads(lambda index: copies[index].transition_to('TRANSIT'))
+
+        self.assertEqual(outcomes.count(True), 1, outcomes)
+        self.assertTrue(all(isinstance(outcome, StatusConflict) for outcome in outcomes if outcome is not True))
+        shipment.refresh_from_db()
+        self.assertEqual((shipment.status, shipment.version), ('TRANSIT', 1))
+        self.assertEqual(ShipmentStatusHistory.objects.filter(shipment=shipment, status='TRANSIT').count(), 1)
+        self.assertEqual(status_counts()['TRANSIT'], 1)
+
+    def test_no_lost_or_impossible_transitions(self):
+        shipments = [Shipment.objects.create() for _ in range(4)]
+        steps = ['TRANSIT', 'SORTING', 'OUT_FOR_DELIVERY', 'DELIVERED']
+
+        def scan(index):
+            # Each thread pushes every shipment along the workflow from a stale read
+            applied = 0
+            for shipment in shipments:
+                copy = Shipment.objects.get(pk=shipment.pk)
+                for status in steps:
+                    try:
+                        if copy.can_transition_to(status) and copy.transition_to(status):
+                            applied += 1
+                    except StatusConflict:
+                        copy = Shipment.objects.get(pk=shipment.pk)
+            return applied
+
+        outcomes = self.run_threads(scan)
+
+        self.assertFalse([outcome for outcome in outcomes if isinstance(outcome, Exception)], outcomes)
+        self.assertEqual(sum(outcomes), len(shipments) * len(steps))
+        for shipment in shipments:
+            shipment.refresh_from_db()
+            self.assertEqual((shipment.status, shipment.version), ('DELIVERED', len(steps)))
+            history = list(
+                ShipmentStatusHistory.objects.filter(shipment=shipment).order_by('pk').values_list('status', flat=True)
+            )
+            self.assertEqual(history, ['REGISTERED'] + steps)
+        counts = status_counts()
+        self.assertEqual(counts['DELIVERED'], len(shipments))
+        self.assertEqual(sum(counts.values()), len(shipments))
+
+    def test_bulk_transition_racing_transition_to(self):
+        shipments = [Shipment.objects.create() for _ in range(20)]
+        pks = [shipment.pk for shipment in shipments]
+
+        def move(index):
+            # Half the threads move the whole set (tour signals), half one shipment at a time
+            if index % 2:
+                return Shipment.objects.filter(pk__in=pks).transition('TRANSIT')
+            moved = 0
+            for pk in pks:
+                try:
+                    moved += Shipment.objects.get(pk=pk).transition_to('TRANSIT')
+                except (StatusConflict, ValueError):
+                    pass
+            return moved
+
+        outcomes = self.run_threads(move)
+
+        self.assertFalse([outcome for outcome in outcomes if isinstance(outcome, Exception)], outcomes)
+        self.assertEqual(sum(outcomes), len(shipments))
+        self.assertEqual(
+            ShipmentStatusHistory.objects.filter(shipment_id__in=pks, status='TRANSIT').count(), len(shipments)
+        )
+        self.assertEqual(set(Shipment.objects.filter(pk__in=pks).values_list('status', 'version')), {('TRANSIT', 1)})
+        self.assertEqual(status_counts()['TRANSIT'], len(shipments))
+
+    def test_scan_batches_racing(self):
+        shipments = [Shipment.objects.create() for _ in range(10)]
+        steps = ['TRANSIT', 'SORTING', 'OUT_FOR_DELIVERY', 'DELIVERED']
+        # Every scanner sends the whole route of every parcel
+        events = [
+            {'tracking_number': shipment.tracking_number, 'status': status}
+            for status in steps for shipment in shipments
+        ]
+
+        outcomes = self.run_threads(lambda index: apply_scans(events))
+
+        self.assertFalse([outcome for outcome in outcomes if isinstance(outcome, Exception)], outcomes)
+        applied = sum(result['result'] == 'applied' for results in outcomes for result in results)
+        self.assertEqual(applied, len(shipments) * len(steps))
+        for shipment in shipments:
+            history = list(
+                ShipmentStatusHistory.objects.filter(shipment=shipment).order_by('pk').values_list('status', flat=True)
+            )
+            self.assertEqual(history, ['REGISTERED'] + steps)
+        counts = status_counts()
+        self.assertEqual(counts['DELIVERED'], len(shipments))
+        self.assertEqual(sum(counts.values()), len(shipments))
@@ -0,0 +1,49 @@
+import re
+
+from django.core.cache import cache
+
+from apps.core.identifiers import has_valid_checksum
+from .models import Shipment
+
+TIMELINE_TIMEOUT = 60 * 10
+TRACKING_NUMBER_RE = re.compile(r'^[A-Z0-9-]{1,30}$')
+
+
+def normalize_tracking_number(value):
+    """Tracking numbers are stored upper case; normalize user input the same way"""
+    return (value or '').strip().upper()
+
+
+def timeline_cache_key(tracking_number):
+    return f'tracking:timeline:{tracking_number}'
+
+
+def get_tracking_timeline(tracking_number):
+    """Return (expedition, status_history) for a tracking number, or None if unknown.
+
+    The result is cached per tracking number and invalidated whenever the
+    shipment or its status history is written (see signals.py).
+    """
+    tracking_number = normalize_tracking_number(tracking_number)
+    if not TRACKING_NUMBER_RE.match(tracking_number):
+        return None
+    if not has_valid_checksum(tracking_number, Shipment.TRACKING_PREFIX):
+        # Mistyped number: no need to look it up
+        return None
+
+    key = timeline_cache_key(tracking_number)
+    timeline = cache.get(key)
+    if timeline is None:
+        # Exact match so the unique index on tracking_number is used
+        expedition = Shipment.objects.select_related(
+            'id_client', 'id_destination', 'id_service_type'
+        ).filter(tracking_number=tracking_number).first()
+        if expedition is None:
+            return None
+        timeline = (expedition, list(expedition.status_history.order_by('changed_at')))
+        cache.set(key, timeline, TIMELINE_TIMEOUT)
+    return timeline
+
+
+def invalidate_tracking_timelines(tracking_numbers):
+    cache.delete_many([timeline_cache_key(number) for number in tracking_numbers])
@@ -5,14 +5,19 @@ urlpatterns = [
     # ================ EXPEDITIONS ================
     path('expeditions/', views.expedition_list, name='expedition_list'),
     path('expeditions/create/', views.create_expedition, name='create_expedition'),
+    path('expeditions/import/', views.import_expeditions, name='import_expeditions'),
     path('expeditions/<int:pk>/', views.expedition_detail, name='expedition_detail'),
     path('expeditions/<int:pk>/update/', views.update_expedition, name='update_expedition'),
     path('expeditions/<int:pk>/delete/', views.delete_expedition, name='delete_expedition'),
     path('expeditions/<int:pk>/status/', views.update_expedition_status, name='update_expedition_status'),
     path('expeditions/<int:pk>/pdf/', views.expedition_pdf, name='expedition_pdf'),
     path('expeditions/export/', views.export_expeditions_csv, name='export_expeditions_csv'),
+    path('expeditions/slips/', views.expedition_slips, name='expedition_slips'),
     path('tracking/', views.track_expedition, name='track_expedition'),
     path('api/calculate-price/', views.calculate_price_api, name='calculate_price_api'),
+    path('api/calculate-price/batch/', views.calculate_price_batch_api, name='calculate_price_batch_api'),
+    path('api/scans/', views.ingest_scans_api, name='ingest_scans_api'),
+    path('api/autocomplete/<str:source>/', views.autocomplete, name='autocomplete'),
 
     # ================ DRIVERS ================
     path('', views.drivers, name='drivers'),
@@ -1,36 +1,58 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.db.models import Q, Count
-from django.http import HttpResponse, JsonResponse
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse
 from django.views.decorators.http import require_POST
-from django.template.loader import get_template
+from django.urls import reverse
 from django.utils import timezone
-import csv
+from django.utils.dateparse import parse_date
+from datetime import datetime, time, timedelta
+import io
 import json
-
-from .models import Shipment, ShipmentStatusHistory, Driver, Vehicule, Destination, TypeService, Zone
+import math
+
+from apps.core.api import api_view
+from apps.core.cache import cached_queryset
+from apps.core.export import stream_queryset_csv
+from apps.core.pagination import KeysetPaginator, paginate
+from apps.jobs.queue import enqueue
+from .autocomplete import PER_PAGE, SOURCES
+from .counters import status_counts
+from .importers import MAX_UPLOAD_SIZE, guess_format, import_manifest
+from .models import ScanBatch, Shipment, StatusConflict, Driver, Vehicule, Destination, TypeService, Zone
+from .pricing import quote, quote_many
+from .scans import ScanBatchError, ScanInProgress, ingest_scans
+from .slips import INLINE_SLIPS, MAX_BATCH, slip_pdf, slip_queryset, slips_response
+from .tasks import INLINE_EXPORT_ROWS
+from .tracking import get_tracking_timeline, normalize_tracking_number
 from .forms import ExpeditionForm, DriverForm, VehiculeForm, DestinationForm, TypeServiceForm, ZoneForm
 
 
 # ================ EXPEDITIONS ================
 
-def expedition_list(request):
-    expeditions = Shipment.objects.all().order_by("-id")
-    
-    # Advanced filters
-    search = request.GET.get('search', '').strip()
-    status_filter = request.GET.get('status', '')
-    client_filter = request.GET.get('client', '')
-    date_from = request.GET.get('date_from', '')
-    date_to = request.GET.get('date_to', '')
-    destination_filter = request.GET.get('destination', '')
+def day_start(value):
+    """Aware datetime at 00:00 of a YYYY-MM-DD string (current timezone), or None"""
+    try:
+        day = parse_date(value or '')
+    except ValueError:
+        return None
+    if day is None:
+        return None
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_expeditions(expeditions, params):
+    """Apply the expedition_list filters from `params`; returns (queryset, filters)"""
+    search = params.get('search', '').strip()
+    status_filter = params.get('status', '')
+    client_filter = params.get('client', '')
+    date_from = params.get('date_from', '')
+    date_to = params.get('date_to', '')
+    destination_filter = params.get('destination', '')
     
     if search:
-        expeditions = expeditions.filter(
-            Q(tracking_number__icontains=search) |
-            Q(id_client__name__icontains=search) |
-            Q(id_destination__ville__icontains=search) |
-            Q(description__icontains=search)
-        )
+        expeditions = expeditions.search(search)
     
     if status_filter:
         expeditions = expeditions.filter(status=status_filter)
@@ -38,45 +60,64 @@ def expedition_list(request):
     if client_filter:
         expeditions = expeditions.filter(id_client_id=client_filter)
     
-    if date_from:
-        expeditions = expeditions.filter(created_at__date__gte=date_from)
+    # Date filters as datetime ranges so the created_at indexes can be used
+    start = day_start(date_from)
+    if start:
+        expeditions = expeditions.filter(created_at__gte=start)
     
-    if date_to:
-        expeditions = expeditions.filter(created_at__date__lte=date_to)
+    end = day_start(date_to)
+    if end:
+        expeditions = expeditions.filter(created_at__lt=end + timedelta(days=1))
     
     if destination_filter:
         expeditions = expeditions.filter(id_destination__ville__icontains=destination_filter)
     
-    # Stats for dashboard
+    filters = {
+        "search": search,
+        "status": status_filter,
+        "client": client_filter,
+        "date_from": date_from,
+        "date_to": date_to,
+        "destination": destination_filter,
+    }
+    return expeditions, filters
+
+
+def expedition_list(request):
+    expeditions, filters = filter_expeditions(
+        Shipment.objects.select_related('id_client', 'id_destination', 'id_service_type'),
+        request.GET,
+    )
+    
+    # Stats for dashboard (read from the counter table, no scan of shipments)
+    counts = status_counts()
     stats = {
-        'total': Shipment.objects.count(),
-        'registered': Shipment.objects.filter(status='REGISTERED').count(),
-        'transit': Shipment.objects.filter(status='TRANSIT').count(),
-        'sorting': Shipment.objects.filter(status='SORTING').count(),
-        'out_for_delivery': Shipment.objects.filter(status='OUT_FOR_DELIVERY').count(),
-        'delivered': Shipment.objects.filter(status='DELIVERED').count(),
-        'failed': Shipment.objects.filter(status='FAILED').count(),
+        'total': sum(counts.values()),
+        'registered': counts.get('REGISTERED', 0),
+        'transit': counts.get('TRANSIT', 0),
+        'sorting': counts.get('SORTING', 0),
+        'out_for_delivery': counts.get('OUT_FOR_DELIVERY', 0),
+        'delivered': counts.get('DELIVERED', 0),
+        'failed': counts.get('FAILED', 0),
     }
     
     # Get unique clients and destinations for filter dropdowns
     from apps.clients.models import Client
-    clients = Client.objects.all()
-    destinations = Destination.objects.values_list('ville', flat=True).distinct()
+    clients = cached_queryset(Client.objects.all(), 'clients')
+    destinations = cached_queryset(
+        Destination.objects.values_list('ville', flat=True).distinct(), 'destinations'
+    )
     
+    page = paginate(request, expeditions, ordering=('-created_at', '-pk'))
+
     context = {
-        "expeditions": expeditions,
+        "expeditions": page,
+        "page": page,
         "stats": stats,
         "clients": clients,
         "destinations": destinations,
         "status_choices": Shipment.STATUS_CHOICES,
-        "filters": {
-            "search": search,
-            "status": status_filter,
-            "client": client_filter,
-            "date_from": date_from,
-            "date_to": date_to,
-            "destination": destination_filter,
-        }
+        "filters": filters,
     }
     return render(request, "logistics/expedition_list.html", context)
 
@@ -110,6 +151,40 @@ def create_expedition(request):
     return render(request, "logistics/create_expedition.html", {"form": form})
 
 
+
+@login_required
+def import_expeditions(request):
+    """Upload a CSV / JSON Lines manifest and create its shipments in bulk (agents and admins)"""
+    if not (request.user.is_superuser or request.user.role in ('admin', 'agent')):
+        return HttpResponseForbidden("Access denied")
+    result = None
+    error = None
+    if request.method == "POST":
+        manifest = request.FILES.get("manifest")
+        if manifest is None:
+            error = "Veuillez choisir un fichier."
+        elif manifest.size > MAX_UPLOAD_SIZE:
+            error = (
+                f"Fichier trop volumineux ({manifest.size // (1024 * 1024)} Mo, "
+                f"maximum {MAX_UPLOAD_SIZE // (1024 * 1024)} Mo) : le découper ou utiliser "
+                "la commande import_shipments."
+            )
+        else:
+            stream = io.TextIOWrapper(manifest.file, encoding="utf-8-sig", newline="")
+            result = import_manifest(
+                stream,
+                format=guess_format(manifest.name),
+                created_by=request.user,
+                dry_run=bool(request.POST.get("dry_run")),
+            )
+    return render(request, "logistics/import_expeditions.html", {
+        "result": result,
+        "error": error,
+        "errors": result.errors[:100] if result else [],
+        "dry_run": bool(request.POST.get("dry_run")),
+        "max_upload_mb": MAX_UPLOAD_SIZE // (1024 * 1024),
+    })
+
 def update_expedition(request, pk):
     expedition = get_object_or_404(Shipment, pk=pk)
     if request.method == "POST":
@@ -130,10 +205,13 @@ def delete_expedition(request, pk):
     return render(request, "logistics/delete_expedition.html", {"expedition": expedition})
 
 
+@login_required
 @require_POST
 def update_expedition_status(request, pk):
     """AJAX endpoint for status updates"""
-    expedition = get_object_or_404(Shipment, pk=pk)
+    expedition = get_object_or_404(
+        Shipment.objects.only('pk', 'status', 'version', 'tracking_number', 'created_at', 'created_by'), pk=pk
+    )
     
     try:
         data = json.loads(request.body)
@@ -152,24 +230,20 @@ def update_expedition_status(request, pk):
             'error': f'Transition de {expedition.status} vers {new_status} non autorisée'
         }, status=400)
     
-    # Update status
-    expedition.status = new_status
-    expedition.save()
-    
-    # Update history entry with additional info
-    history = ShipmentStatusHistory.objects.filter(
-        shipment=expedition, 
-        status=new_status
-    ).order_by('-changed_at').first()
-    
-    if history:
-        if notes:
-            history.notes = notes
-        if location:
-            history.location = location
-        if request.user.is_authenticated:
-            history.changed_by = request.user
-        history.save()
+    # One conditional UPDATE and one history row with the notes, location and user
+    try:
+        expedition.transition_to(
+            new_status,
+            changed_by=request.user,
+            notes=notes or None,
+            location=location,
+        )
+    except StatusConflict:
+        return JsonResponse({
+            'success': False,
+            'error': "Le statut a été modifié entre-temps, rechargez la page",
+            'status': expedition.status,
+        }, status=409)
     
     return JsonResponse({
         'success': True,
@@ -182,16 +256,16 @@ def update_expedition_status(request, pk):
 
 def track_expedition(request):
     """Public tracking page"""
-    tracking_number = request.GET.get('tracking', '').strip().upper()
+    tracking_number = normalize_tracking_number(request.GET.get('tracking', ''))
     expedition = None
     status_history = None
     error = None
     
     if tracking_number:
-        try:
-            expedition = Shipment.objects.get(tracking_number__iexact=tracking_number)
-            status_history = expedition.status_history.all().order_by('changed_at')
-        except Shipment.DoesNotExist:
+        timeline = get_tracking_timeline(tracking_number)
+        if timeline:
+            expedition, status_history = timeline
+        else:
             error = "Aucune expédition trouvée avec ce numéro de suivi."
     
     context = {
@@ -206,25 +280,11 @@ def track_expedition(request):
 
 
 def expedition_pdf(request, pk):
-    """Generate PDF shipping slip"""
-    expedition = get_object_or_404(Shipment, pk=pk)
+    """Generate PDF shipping slip (cached on disk until the shipment changes)"""
+    expedition = get_object_or_404(slip_queryset(), pk=pk)
     
-    # Try to use weasyprint for PDF generation
     try:
-        from weasyprint import HTML
-        
-        template = get_template('logistics/expedition_pdf.html')
-        html_string = template.render({
-            'expedition': expedition,
-            'generated_at': timezone.now(),
-        })
-        
-        html = HTML(string=html_string, base_url=request.build_absolute_uri('/'))
-        pdf = html.write_pdf()
-        
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = f'inline; filename="bon_expedition_{expedition.tracking_number}.pdf"'
-        return response
+        pdf = slip_pdf(expedition, request.build_absolute_uri('/'))
     except ImportError:
         # Fallback: return HTML for printing
         return render(request, 'logistics/expedition_pdf.html', {
@@ -232,6 +292,29 @@ def expedition_pdf(request, pk):
             'generated_at': timezone.now(),
             'print_mode': True,
         })
+    
+    response = HttpResponse(pdf, content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename="bon_expedition_{expedition.tracking_number}.pdf"'
+    return response
+
+
+@login_required
+def expedition_slips(request):
+    """One PDF with the slips of the filtered expeditions (same filters as expedition_list)"""
+    expeditions, _ = filter_expeditions(slip_queryset(), request.GET)
+    back_url = f"{reverse('expedition_list')}?{request.GET.urlencode()}"
+    count = expeditions.count()
+    if count > MAX_BATCH:
+        messages.error(request, f"Plus de {MAX_BATCH} expéditions : affinez les filtres pour imprimer les bons.")
+        return redirect(back_url)
+    if count > INLINE_SLIPS:
+        job = enqueue(
+            'logistics.expedition_slips', created_by=request.user,
+            params=request.GET.dict(), base_url=request.build_absolute_uri('/'), back_url=back_url,
+        )
+        return redirect('jobs:detail', pk=job.pk)
+    shipments = list(expeditions.order_by('-created_at', '-pk'))
+    return slips_response(request, shipments, 'bons_expedition', 'Expéditions', back_url)
 
 
 def calculate_price_api(request):
@@ -244,73 +327,166 @@ def calculate_price_api(request):
     try:
         weight = float(weight) if weight else 0
         volume = float(volume) if volume else 0
+        if not (math.isfinite(weight) and math.isfinite(volume)):
+            raise ValueError(weight, volume)
     except ValueError:
-        return JsonResponse({'price': 0, 'error': 'Invalid weight or volume'})
-    
-    base_price = 0
-    weight_rate = 0
-    volume_rate = 0
+        return JsonResponse({'price': 0, 'error': 'Invalid weight or volume'}, status=400)
     
-    if destination_id:
-        try:
-            destination = Destination.objects.get(pk=destination_id)
-            if destination.zone:
-                base_price = float(destination.zone.base_price or 0)
-        except Destination.DoesNotExist:
-            pass
+    price = quote(destination_id, service_type_id, weight, volume)
     
-    if service_type_id:
+    return JsonResponse({
+        'price': round(float(price.total), 2),
+        'base_price': float(price.base_price),
+        'weight_cost': round(float(price.weight_cost), 2),
+        'volume_cost': round(float(price.volume_cost), 2),
+    })
+
+
+MAX_BATCH_QUOTES = 1000
+# Batch pricing calls per account: (calls, seconds)
+BATCH_QUOTES_RATE = (30, 60)
+
+
+@require_POST
+@api_view(rate=BATCH_QUOTES_RATE)
+def calculate_price_batch_api(request):
+    """API endpoint pricing a whole manifest in one call.
+
+    Body: {"items": [{"destination": id, "service_type": id, "weight": kg, "volume": m3}, ...]}
+    (items may also be [destination, service_type, weight, volume] arrays).
+    Clients authenticate with an API key (apps/core/api.py); bigger manifests
+    are split over several calls.
+    """
+    try:
+        items = json.loads(request.body).get('items')
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+    if not isinstance(items, list):
+        return JsonResponse({'success': False, 'error': 'items must be a list'}, status=400)
+    if len(items) > MAX_BATCH_QUOTES:
+        return JsonResponse(
+            {'success': False, 'error': f'At most {MAX_BATCH_QUOTES} items per request'}, status=400
+        )
+
+    rows = []
+    for index, item in enumerate(items):
+        if isinstance(item, dict):
+            item = (item.get('destination'), item.get('service_type'), item.get('weight'), item.get('volume'))
         try:
-            service = TypeService.objects.get(pk=service_type_id)
-            weight_rate = float(service.weight_rate or 0)
-            volume_rate = float(service.volume_rate or 0)
-        except TypeService.DoesNotExist:
-            pass
-    
-    total = base_price + (weight * weight_rate) + (volume * volume_rate)
-    
+            destination_id, service_type_id, weight, volume = item
+            weight, volume = float(weight or 0), float(volume or 0)
+            if not (math.isfinite(weight) and math.isfinite(volume)):
+                raise ValueError(weight, volume)
+            rows.append((destination_id, service_type_id, weight, volume))
+        except (TypeError, ValueError):
+            return JsonResponse(
+                {'success': False, 'error': f'Invalid item at index {index}'}, status=400
+            )
+
+    quotes = quote_many(rows)
     return JsonResponse({
-        'price': round(total, 2),
-        'base_price': base_price,
-        'weight_cost': round(weight * weight_rate, 2),
-        'volume_cost': round(volume * volume_rate, 2),
+        'success': True,
+        'quotes': [
+            {
+                'price': round(float(price.total), 2),
+                'base_price': float(price.base_price),
+                'weight_cost': round(float(price.weight_cost), 2),
+                'volume_cost': round(float(price.volume_cost), 2),
+            }
+            for price in quotes
+        ],
+        'total': round(float(sum(price.total for price in quotes)), 2),
     })
 
 
-def export_expeditions_csv(request):
-    """Export expeditions to CSV"""
-    response = HttpResponse(
-        content_type='text/csv',
-        headers={'Content-Disposition': 'attachment; filename="expeditions.csv"'},
-    )
-    response.write('\ufeff')  # BOM for Excel UTF-8
-    writer = csv.writer(response)
-    writer.writerow([
+@require_POST
+@api_view()
+def ingest_scans_api(request):
+    """Batch of parcel scans from the sorting-center scanners (see scans.py).
+
+    Body: NDJSON or a JSON array of {"tracking_number", "status", "location", "scanned_at"}.
+    Scanners authenticate with an API key (apps/core/api.py). Send an
+    Idempotency-Key header so that a retried batch is not applied twice.
+    """
+    key = request.headers.get('Idempotency-Key', '').strip()
+    if len(key) > ScanBatch._meta.get_field('key').max_length:
+        return JsonResponse({'success': False, 'error': 'Idempotency-Key too long'}, status=400)
+    try:
+        response = ingest_scans(
+            request.body,
+            changed_by=request.user,
+            idempotency_key=key or None,
+        )
+    except ScanBatchError as error:
+        return JsonResponse({'success': False, 'error': str(error)}, status=400)
+    except ScanInProgress:
+        return JsonResponse(
+            {'success': False, 'error': 'A batch with this Idempotency-Key is still being processed'}, status=409
+        )
+    return JsonResponse(response)
+
+
+@login_required
+def autocomplete(request, source):
+    """Paginated choices of a picker: ?q=<prefix>&cursor=<next> (see autocomplete.py)"""
+    source = SOURCES.get(source)
+    if source is None:
+        raise Http404
+    queryset = source.search(source.queryset(), request.GET.get('q', '').strip(), request.GET)
+    page = KeysetPaginator(queryset, source.ordering, PER_PAGE).get_page(request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [{'id': obj.pk, 'text': source.label(obj)} for obj in page],
+        'next': page.next_cursor,
+    })
+
+
+def expedition_export(params):
+    """(header, queryset, row formatter) of the expeditions CSV for the expedition_list filters"""
+    expeditions, _ = filter_expeditions(Shipment.objects.all(), params)
+    status_display = dict(Shipment.STATUS_CHOICES)
+
+    def row(values):
+        (tracking_number, client, ville, pays, service, weight, volume, status,
+         total_price, created_at, estimated_delivery_date, reel_delivery_date) = values
+        return [
+            tracking_number,
+            client or '-',
+            f"{ville} ({pays})" if ville is not None else '-',
+            service or '-',
+            weight or '-',
+            volume or '-',
+            status_display.get(status, status),
+            total_price,
+            created_at.strftime('%d/%m/%Y %H:%M'),
+            estimated_delivery_date.strftime('%d/%m/%Y') if estimated_delivery_date else '-',
+            reel_delivery_date.strftime('%d/%m/%Y') if reel_delivery_date else '-',
+        ]
+
+    header = [
         'N° Suivi', 'Client', 'Destination', 'Type Service', 
         'Poids (kg)', 'Volume (m³)', 'Statut', 'Prix Total',
         'Date Création', 'Livraison Estimée', 'Livraison Réelle'
-    ])
-    
-    expeditions = Shipment.objects.select_related(
-        'id_client', 'id_destination', 'id_service_type'
-    ).all()
-    
-    for exp in expeditions:
-        writer.writerow([
-            exp.tracking_number,
-            str(exp.id_client) if exp.id_client else '-',
-            str(exp.id_destination) if exp.id_destination else '-',
-            str(exp.id_service_type) if exp.id_service_type else '-',
-            exp.weight or '-',
-            exp.volume or '-',
-            exp.get_status_display(),
-            exp.total_price,
-            exp.created_at.strftime('%d/%m/%Y %H:%M'),
-            exp.estimated_delivery_date.strftime('%d/%m/%Y') if exp.estimated_delivery_date else '-',
-            exp.reel_delivery_date.strftime('%d/%m/%Y') if exp.reel_delivery_date else '-',
-        ])
-    
-    return response
+    ]
+    rows = expeditions.order_by('pk').values_list(
+        'tracking_number', 'id_client__name', 'id_destination__ville', 'id_destination__pays',
+        'id_service_type__nom', 'weight', 'volume', 'status', 'total_price',
+        'created_at', 'estimated_delivery_date', 'reel_delivery_date',
+    )
+    return header, rows, row
+
+
+@login_required
+def export_expeditions_csv(request):
+    """Export expeditions to CSV (same filters as expedition_list).
+
+    Large exports are written by a background job (apps/jobs): the user waits
+    on the job page instead of on the response.
+    """
+    header, rows, row = expedition_export(request.GET)
+    if rows.count() > INLINE_EXPORT_ROWS:
+        job = enqueue('logistics.export_expeditions', created_by=request.user, params=request.GET.dict())
+        return redirect('jobs:detail', pk=job.pk)
+    return stream_queryset_csv('expeditions.csv', header, rows, row=row, bom=True)
 
 
 def delete_expedition(request, pk):
@@ -341,8 +517,11 @@ def drivers(request):
     elif available == 'NO':
         drivers_qs = drivers_qs.filter(available=False)
 
+    page = paginate(request, drivers_qs)
+
     context = {
-        'drivers': drivers_qs,
+        'drivers': page,
+        'page': page,
         'query': query,
         'available': available or 'ALL'
     }
@@ -380,21 +559,12 @@ def delete_driver(request, pk):
 
 
 def export_drivers_csv(request):
-    response = HttpResponse(
-        content_type='text/csv',
-        headers={'Content-Disposition': 'attachment; filename="drivers.csv"'},
+    return stream_queryset_csv(
+        'drivers.csv',
+        ['Prénom', 'Nom', 'Téléphone', 'Permis', 'Disponible'],
+        Driver.objects.values_list('first_name', 'last_name', 'phone', 'license_number', 'available'),
+        row=lambda d: [*d[:4], 'Oui' if d[4] else 'Non'],
     )
-    writer = csv.writer(response)
-    writer.writerow(['Prénom', 'Nom', 'Téléphone', 'Permis', 'Disponible'])
-    for d in Driver.objects.all():
-        writer.writerow([
-            d.first_name,
-            d.last_name,
-            d.phone,
-            d.license_number,
-            'Oui' if d.available else 'Non'
-        ])
-    return response
 
 
 # ================ VEHICULES ================
@@ -439,15 +609,11 @@ def delete_vehicule(request, pk):
 
 
 def export_vehicules_csv(request):
-    response = HttpResponse(
-        content_type='text/csv',
-        headers={'Content-Disposition': 'attachment; filename="vehicules.csv"'},
+    return stream_queryset_csv(
+        'vehicules.csv',
+        ['Immatriculation', 'Type'],
+        Vehicule.objects.values_list('immatriculation', 'type'),
     )
-    writer = csv.writer(response)
-    writer.writerow(['Immatriculation', 'Type'])
-    for v in Vehicule.objects.all():
-        writer.writerow([v.immatriculation, v.type])
-    return response
 
 
 # ================ DESTINATIONS ================
@@ -464,8 +630,11 @@ def destinations(request):
             Q(zone__nom__icontains=query)
         )
 
+    page = paginate(request, destinations_qs)
+
     return render(request, 'destination/destination.html', {
-        'destinations': destinations_qs,
+        'destinations': page,
+        'page': page,
         'query': query
     })
 
@@ -500,16 +669,12 @@ def delete_destination(request, pk):
 
 
 def export_destinations_csv(request):
-    response = HttpResponse(
-        content_type='text/csv',
-        headers={'Content-Disposition': 'attachment; filename="destinations.csv"'},
+    return stream_queryset_csv(
+        'destinations.csv',
+        ['Adresse', 'Ville', 'Pays', 'Code Postal', 'Zone'],
+        Destination.objects.values_list('adresse', 'ville', 'pays', 'code_postal', 'zone__nom'),
+        row=lambda d: [*d[:4], d[4] or ''],
     )
-    writer = csv.writer(response)
-    writer.writerow(['Adresse', 'Ville', 'Pays', 'Code Postal', 'Zone'])
-    for d in Destination.objects.all():
-        zone_nom = d.zone.nom if d.zone else ''
-        writer.writerow([d.adresse, d.ville, d.pays, d.code_postal, zone_nom])
-    return response
 
 
 # ================ TYPES DE SERVICE ================
@@ -557,15 +722,11 @@ def delete_type_service(request, pk):
 
 
 def export_type_services_csv(request):
-    response = HttpResponse(
-        content_type='text/csv',
-        headers={'Content-Disposition': 'attachment; filename="type_services.csv"'},
+    return stream_queryset_csv(
+        'type_services.csv',
+        ['Nom', 'Tarif Poids', 'Tarif Volume'],
+        TypeService.objects.values_list('nom', 'weight_rate', 'volume_rate'),
     )
-    writer = csv.writer(response)
-    writer.writerow(['Nom', 'Tarif Poids', 'Tarif Volume'])
-    for s in TypeService.objects.all():
-        writer.writerow([s.nom, s.weight_rate, s.volume_rate])
-    return response
 
 
 # ================ ZONES ================
@@ -613,12 +774,8 @@ def delete_zone(request, pk):
 
 
 def export_zones_csv(request):
-    response = HttpResponse(
-        content_type='text/csv',
-        headers={'Content-Disposition': 'attachment; filename="zones.csv"'},
+    return stream_queryset_csv(
+        'zones.csv',
+        ['Zone', 'Prix de base'],
+        Zone.objects.values_list('nom', 'base_price'),
     )
-    writer = csv.writer(response)
-    writer.writerow(['Zone', 'Prix de base'])
-    for z in Zone.objects.all():
-        writer.writerow([z.nom, z.base_price])
-    return response
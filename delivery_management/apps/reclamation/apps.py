@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ReclamationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.reclamation'
+
+    def ready(self):
+        import apps.reclamation.signals  # noqa: F401
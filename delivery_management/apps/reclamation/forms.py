@@ -1,6 +1,7 @@
 from django import forms
 from .models import Reclamation, ReclamationComment, ReclamationDocument, ReclamationTask
 from apps.clients.models import Client
+from apps.core.widgets import AutocompleteSelect, AutocompleteSelectMultiple
 from apps.logistics.models import Shipment
 from apps.facturation.models import Invoice
 from django.contrib.auth import get_user_model
@@ -18,7 +19,8 @@ class ReclamationForm(forms.ModelForm):
             'shipments', 'invoice', 'priority', 'assigned_to'
         ]
         widgets = {
-            'client': forms.Select(attrs={
+            # Listes chargées à la demande (API d'autocomplétion)
+            'client': AutocompleteSelect('clients', attrs={
                 'class': 'form-control',
                 'required': True
             }),
@@ -31,7 +33,7 @@ class ReclamationForm(forms.ModelForm):
                 'rows': 4,
                 'placeholder': 'Décrivez la réclamation en détail...'
             }),
-            'shipments': forms.SelectMultiple(attrs={
+            'shipments': AutocompleteSelectMultiple('shipments', forward=['client'], attrs={
                 'class': 'form-control',
                 'size': 4
             }),
@@ -52,12 +54,12 @@ class ReclamationForm(forms.ModelForm):
         if 'client' in self.data:
             try:
                 client_id = int(self.data.get('client'))
-                self.fields['shipments'].queryset = Shipment.objects.filter(client_id=client_id)
+                self.fields['shipments'].queryset = Shipment.objects.filter(id_client_id=client_id)
                 self.fields['invoice'].queryset = Invoice.objects.filter(client_id=client_id)
             except (ValueError, TypeError):
                 pass
         elif self.instance.pk:
-            self.fields['shipments'].queryset = Shipment.objects.filter(client=self.instance.client)
+            self.fields['shipments'].queryset = Shipment.objects.filter(id_client=self.instance.client)
             self.fields['invoice'].queryset = Invoice.objects.filter(client=self.instance.client)
         
         # Agents assignables (tous les utilisateurs staff)
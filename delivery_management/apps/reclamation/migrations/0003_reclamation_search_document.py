@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:15
+
+from django.db import migrations, models
+
+from apps.core.search import create_search_index, drop_search_index
+
+
+def build_search_documents(apps, schema_editor):
+    Reclamation = apps.get_model('reclamation', 'Reclamation')
+    rows = Reclamation.objects.values_list('pk', 'reference', 'client__name', 'description')
+    reclamations = [
+        Reclamation(pk=pk, search_document=' '.join(part for part in parts if part))
+        for pk, *parts in rows.iterator()
+    ]
+    Reclamation.objects.bulk_update(reclamations, ['search_document'], batch_size=500)
+    create_search_index(schema_editor, Reclamation._meta.db_table)
+
+
+def drop_search_documents(apps, schema_editor):
+    drop_search_index(schema_editor, apps.get_model('reclamation', 'Reclamation')._meta.db_table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reclamation', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reclamation',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(build_search_documents, drop_search_documents),
+    ]
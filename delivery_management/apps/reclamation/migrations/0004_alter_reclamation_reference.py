@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reclamation', '0003_reclamation_search_document'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reclamation',
+            name='reference',
+            field=models.CharField(editable=False, max_length=30, unique=True),
+        ),
+    ]
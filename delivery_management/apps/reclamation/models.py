@@ -1,10 +1,38 @@
 from django.db import models
 from django.conf import settings
+from django.db.models.functions import CumeDist
 from apps.clients.models import Client
+from apps.core.identifiers import insert_with_retry, new_identifier
+from apps.core.stats import resolution_time
 from apps.logistics.models import Shipment
 from apps.facturation.models import Invoice
 
 
+class ReclamationQuerySet(models.QuerySet):
+    def search(self, query):
+        """Réclamations dont le document de recherche contient tous les termes de `query`"""
+        from apps.core.search import get_search_backend
+        return get_search_backend(self.model).filter(self, query)
+    
+    def resolved(self):
+        """Réclamations résolues, annotées de leur délai de résolution (`resolution_duration`)"""
+        return self.filter(status='resolue', resolved_at__isnull=False).annotate(
+            resolution_duration=resolution_time()
+        )
+    
+    def resolution_percentile(self, fraction):
+        """Délai de résolution sous lequel se trouve `fraction` des réclamations résolues.
+        
+        Calculé par la base avec la fonction de fenêtre CUME_DIST() : une seule
+        ligne est renvoyée, quel que soit le nombre de réclamations.
+        """
+        return self.resolved().annotate(
+            cume_dist=models.Window(CumeDist(), order_by=models.F('resolution_duration').asc())
+        ).filter(cume_dist__gte=fraction).order_by('resolution_duration').values_list(
+            'resolution_duration', flat=True
+        ).first()
+
+
 class Reclamation(models.Model):
     """Modèle pour gérer les réclamations clients"""
     
@@ -34,7 +62,9 @@ class Reclamation(models.Model):
     ]
     
     # Informations de base
-    reference = models.CharField(max_length=20, unique=True, editable=False)
+    # REC-<temps><séquence><contrôle>, voir apps/core/identifiers.py
+    REFERENCE_PREFIX = 'REC'
+    reference = models.CharField(max_length=30, unique=True, editable=False)
     client = models.ForeignKey(
         Client, 
         on_delete=models.CASCADE, 
@@ -104,18 +134,34 @@ class Reclamation(models.Model):
         verbose_name="Description de la résolution"
     )
     
+    # Référence, client et description, indexés pour la recherche
+    search_document = models.TextField(blank=True, default='', editable=False)
+    
+    objects = ReclamationQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = "Réclamation"
         verbose_name_plural = "Réclamations"
     
     def save(self, *args, **kwargs):
-        if not self.reference:
-            import uuid
-            from django.utils import timezone
-            year = timezone.now().year
-            self.reference = f"REC-{year}-{uuid.uuid4().hex[:6].upper()}"
-        super().save(*args, **kwargs)
+        generated = not self.reference
+        if generated:
+            self.reference = new_identifier(self.REFERENCE_PREFIX)
+        
+        def insert():
+            self.search_document = self.build_search_document()
+            super(Reclamation, self).save(*args, **kwargs)
+        
+        if generated:
+            # Une référence générée est remplacée si elle entre en collision
+            insert_with_retry(self, 'reference', self.REFERENCE_PREFIX, insert)
+        else:
+            insert()
+    
+    def build_search_document(self):
+        parts = [self.reference, self.client.name if self.client_id else '', self.description]
+        return ' '.join(part for part in parts if part)
     
     def __str__(self):
         return f"{self.reference} - {self.client.name}"
@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from apps.clients.models import Client
+from apps.core.cache import invalidate_on
+from apps.core.search import get_search_backend, refresh_documents, reindex
+from .models import Reclamation
+
+invalidate_on(Reclamation, 'reclamations')
+
+
+@receiver(post_save, sender=Reclamation)
+def index_reclamation(sender, instance, **kwargs):
+    """Indexe le document de recherche construit dans Reclamation.save()"""
+    reindex(Reclamation, [instance])
+
+
+@receiver(post_delete, sender=Reclamation)
+def unindex_reclamation(sender, instance, **kwargs):
+    get_search_backend(Reclamation).remove(Reclamation, [instance.pk])
+
+
+@receiver(post_save, sender=Client)
+def refresh_client_reclamation_documents(sender, instance, created, **kwargs):
+    """Le nom du client fait partie du document de recherche de ses réclamations"""
+    if not created:
+        refresh_documents(Reclamation.objects.filter(client=instance).select_related('client'))
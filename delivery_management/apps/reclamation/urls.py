@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     path('', views.reclamation_list, name='reclamation_list'),
     path('nouveau/', views.reclamation_create, name='reclamation_create'),
+    path('statistiques/', views.reclamation_stats, name='reclamation_stats'),
     path('<int:pk>/', views.reclamation_detail, name='reclamation_detail'),
     path('<int:pk>/modifier/', views.reclamation_edit, name='reclamation_edit'),
     path('<int:pk>/status/', views.reclamation_update_status, name='reclamation_update_status'),
@@ -2,7 +2,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from django.db.models import Count, Avg, Q
+from django.db.models import Count, Q
 from django.db.models.functions import TruncMonth, ExtractMonth
 from django.utils import timezone
 from datetime import timedelta
@@ -13,12 +13,17 @@ from .forms import (
     ReclamationDocumentForm, ReclamationTaskForm, ReclamationFilterForm
 )
 from apps.clients.models import Client
+from apps.core.cache import cached_queryset, cached_view
+from apps.core.pagination import paginate
+from apps.core.stats import duration_in_days, mean_resolution_time
 
 
 @login_required
 def reclamation_list(request):
     """Liste des réclamations avec filtres et statistiques"""
-    reclamations = Reclamation.objects.select_related('client', 'assigned_to', 'created_by')
+    reclamations = Reclamation.objects.select_related(
+        'client', 'assigned_to', 'created_by'
+    ).prefetch_related('shipments')
     
     # Filtrage direct via GET
     status = request.GET.get('status')
@@ -33,11 +38,7 @@ def reclamation_list(request):
     if priority:
         reclamations = reclamations.filter(priority=priority)
     if search:
-        reclamations = reclamations.filter(
-            Q(reference__icontains=search) |
-            Q(description__icontains=search) |
-            Q(client__name__icontains=search)
-        )
+        reclamations = reclamations.search(search)
     
     # Statistiques
     stats = {
@@ -48,10 +49,13 @@ def reclamation_list(request):
     }
     
     # Clients pour le modal de création
-    clients = Client.objects.all()
+    clients = cached_queryset(Client.objects.all(), 'clients')
+    
+    page = paginate(request, reclamations, ordering=('-created_at', '-pk'))
     
     context = {
-        'reclamations': reclamations,
+        'reclamations': page,
+        'page': page,
         'stats': stats,
         'clients': clients,
     }
@@ -212,19 +216,23 @@ def task_update_status(request, pk):
 
 
 @login_required
+@cached_view('reclamations', 'clients')
 def reclamation_stats(request):
     """Statistiques et rapports des réclamations"""
     # Période par défaut: 30 derniers jours
     end_date = timezone.now()
     start_date = end_date - timedelta(days=30)
     
-    # Statistiques générales
-    total = Reclamation.objects.count()
-    en_cours = Reclamation.objects.filter(status='en_cours').count()
-    resolues = Reclamation.objects.filter(status='resolue').count()
-    annulees = Reclamation.objects.filter(status='annulee').count()
+    # Statistiques générales et délai moyen de résolution, en une requête
+    totals = Reclamation.objects.aggregate(
+        total=Count('id'),
+        en_cours=Count('id', filter=Q(status='en_cours')),
+        resolues=Count('id', filter=Q(status='resolue')),
+        annulees=Count('id', filter=Q(status='annulee')),
+        avg_resolution=mean_resolution_time(Q(status='resolue', resolved_at__isnull=False)),
+    )
     
-    # Réclamations par type
+    # Réclamations par type (les 5 premiers sont les motifs récurrents)
     by_type = list(Reclamation.objects.values('type_reclamation').annotate(
         count=Count('id')
     ).order_by('-count'))
@@ -244,42 +252,25 @@ def reclamation_stats(request):
         count=Count('id')
     ).order_by('month'))
     
-    # Délai moyen de résolution
-    resolved_reclamations = Reclamation.objects.filter(
-        status='resolue', 
-        resolved_at__isnull=False
-    )
-    
-    avg_resolution_time = None
-    if resolved_reclamations.exists():
-        total_days = 0
-        count = 0
-        for rec in resolved_reclamations:
-            if rec.resolved_at and rec.created_at:
-                delta = rec.resolved_at - rec.created_at
-                total_days += delta.days
-                count += 1
-        if count > 0:
-            avg_resolution_time = round(total_days / count, 1)
-    
-    # Motifs récurrents (top 5)
-    top_motifs = Reclamation.objects.values('type_reclamation').annotate(
-        count=Count('id')
-    ).order_by('-count')[:5]
+    # Délai médian et 90e centile, calculés par la base (fonction de fenêtre)
+    p50_resolution = Reclamation.objects.resolution_percentile(0.5)
+    p90_resolution = Reclamation.objects.resolution_percentile(0.9)
     
     # Réclamations récentes
     recent = Reclamation.objects.select_related('client').order_by('-created_at')[:5]
     
     context = {
-        'total': total,
-        'en_cours': en_cours,
-        'resolues': resolues,
-        'annulees': annulees,
+        'total': totals['total'],
+        'en_cours': totals['en_cours'],
+        'resolues': totals['resolues'],
+        'annulees': totals['annulees'],
         'by_type': by_type,
         'by_priority': by_priority,
         'by_month': by_month,
-        'avg_resolution_time': avg_resolution_time,
-        'top_motifs': top_motifs,
+        'avg_resolution_time': duration_in_days(totals['avg_resolution']),
+        'p50_resolution_time': duration_in_days(p50_resolution),
+        'p90_resolution_time': duration_in_days(p90_resolution),
+        'top_motifs': by_type[:5],
         'recent': recent,
         'type_choices': dict(Reclamation.TYPE_CHOICES),
         'priority_choices': dict(Reclamation.PRIORITY_CHOICES),
@@ -5,3 +5,10 @@ class TourConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.tour'
     verbose_name = 'Gestion des Tournées'
+
+    def ready(self):
+        from apps.core.cache import invalidate_on
+        from .models import Tour, TourExpedition
+
+        invalidate_on(Tour, 'tours')
+        invalidate_on(TourExpedition, 'tours')
@@ -1,7 +1,19 @@
 from django.db import models
+from django.db.models import Count, Q, Sum
 from django.utils import timezone
 
 
+class TourQuerySet(models.QuerySet):
+    def with_metrics(self):
+        """Annote le nombre d'expéditions, de livraisons, le poids et le volume total en SQL"""
+        return self.annotate(
+            metric_expedition_count=Count('tour_expeditions'),
+            metric_delivered_count=Count('tour_expeditions', filter=Q(tour_expeditions__delivered=True)),
+            metric_total_weight=Sum('tour_expeditions__expedition__weight'),
+            metric_total_volume=Sum('tour_expeditions__expedition__volume'),
+        )
+
+
 class Tour(models.Model):
     """Modèle de tournée pour regrouper les expéditions"""
     STATUS_CHOICES = [
@@ -59,6 +71,8 @@ class Tour(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TourQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Tournée"
         verbose_name_plural = "Tournées"
@@ -76,25 +90,38 @@ class Tour(models.Model):
         expedition_ids = self.tour_expeditions.values_list('expedition_id', flat=True)
         return Shipment.objects.filter(id__in=expedition_ids)
     
+    # Les propriétés suivantes utilisent les annotations de with_metrics() si présentes
     @property
     def expedition_count(self):
         """Nombre d'expéditions dans cette tournée"""
+        if hasattr(self, 'metric_expedition_count'):
+            return self.metric_expedition_count
         return self.tour_expeditions.count()
     
     @property
     def delivered_count(self):
         """Nombre d'expéditions livrées"""
+        if hasattr(self, 'metric_delivered_count'):
+            return self.metric_delivered_count
         return self.tour_expeditions.filter(delivered=True).count()
     
     @property
     def total_weight(self):
         """Poids total des expéditions"""
-        return sum(te.expedition.weight or 0 for te in self.tour_expeditions.select_related('expedition').all())
+        if not hasattr(self, 'metric_total_weight'):
+            self.metric_total_weight = self.tour_expeditions.aggregate(
+                total=Sum('expedition__weight')
+            )['total']
+        return self.metric_total_weight or 0
     
     @property
     def total_volume(self):
         """Volume total des expéditions"""
-        return sum(te.expedition.volume or 0 for te in self.tour_expeditions.select_related('expedition').all())
+        if not hasattr(self, 'metric_total_volume'):
+            self.metric_total_volume = self.tour_expeditions.aggregate(
+                total=Sum('expedition__volume')
+            )['total']
+        return self.metric_total_volume or 0
 
 
 class TourExpedition(models.Model):
@@ -0,0 +1,17 @@
+"""Tâches en arrière-plan des tournées (apps/jobs/queue.py)"""
+from apps.jobs.queue import PermanentFailure, task
+from apps.logistics.tasks import store_slips
+from .models import Tour
+
+
+@task('tour.tour_slips')
+def tour_slips(job, tour_id, base_url=None, back_url=''):
+    """Bons d'expédition d'une tournée, dans l'ordre de livraison (un seul PDF)"""
+    from .views import tour_slip_shipments
+
+    tour = Tour.objects.filter(pk=tour_id).first()
+    if tour is None:
+        raise PermanentFailure(f"Tournée #{tour_id} supprimée")
+    return store_slips(
+        job, f'bons_tournee_{tour.pk}', tour_slip_shipments(tour), base_url, f'Tournée #{tour.pk}', back_url
+    )
@@ -1,3 +1,48 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from apps.logistics.models import Driver, Shipment, Vehicule
+from apps.users.models import CustomUser
+from .models import Tour, TourExpedition
+
+
+class ExportToursCsvTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('agent', password='secret')
+        cls.driver = Driver.objects.create(
+            first_name='Amine', last_name='Benali', license_number='L-1', phone='0550'
+        )
+        cls.vehicle = Vehicule.objects.create(immatriculation='123-456-16')
+
+    def add_tours(self, count):
+        for _ in range(count):
+            tour = Tour.objects.create(id_driver=self.driver, id_vehicle=self.vehicle)
+            for _ in range(2):
+                TourExpedition.objects.create(tour=tour, expedition=Shipment.objects.create())
+
+    def export(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('tour:export'))
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        return lines, len(queries)
+
+    def test_query_count_does_not_depend_on_tour_count(self):
+        self.add_tours(2)
+        lines, few = self.export()
+        self.assertEqual(len(lines), 3)
+
+        self.add_tours(8)
+        lines, many = self.export()
+        self.assertEqual(len(lines), 11)
+        self.assertEqual(few, many)
+
+    def test_row_content(self):
+        self.add_tours(1)
+        lines, _ = self.export()
+        fields = lines[1].split(',')
+        self.assertEqual(fields[2:5], ['Amine Benali', '123-456-16', 'En attente'])
+        self.assertEqual(fields[7], '2')
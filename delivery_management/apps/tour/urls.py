@@ -22,4 +22,5 @@ urlpatterns = [
     # Gestion des expéditions
     path('<int:pk>/add-expedition/', views.add_expedition, name='add_expedition'),
     path('<int:pk>/remove-expedition/<int:expedition_pk>/', views.remove_expedition, name='remove_expedition'),
+    path('<int:pk>/slips/', views.tour_slips, name='slips'),
 ]
@@ -1,14 +1,19 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q, Sum, Count, Max
-from django.http import HttpResponse, JsonResponse
+from django.http import JsonResponse
 from django.contrib import messages
+from django.urls import reverse
 from django.utils import timezone
-import csv
 
 from .models import Tour, TourExpedition
 from .forms import TourForm, TourCreateForm, TourCompleteForm, AddExpeditionForm
+from apps.core.cache import cached_view, invalidate_tags
+from apps.core.export import stream_queryset_csv
+from apps.core.pagination import paginate
 from apps.logistics.models import Shipment, Driver, Vehicule
+from apps.jobs.queue import enqueue
+from apps.logistics.slips import INLINE_SLIPS, slip_queryset, slips_response
 
 
 @login_required
@@ -16,7 +21,7 @@ def tour_list(request):
     """Liste des tournées avec filtres et statistiques"""
     query = request.GET.get('q')
     status_filter = request.GET.get('status')
-    tours_qs = Tour.objects.select_related('id_driver', 'id_vehicle').all()
+    tours_qs = Tour.objects.select_related('id_driver', 'id_vehicle')
     
     if query:
         tours_qs = tours_qs.filter(
@@ -29,21 +34,26 @@ def tour_list(request):
     if status_filter and status_filter != 'ALL':
         tours_qs = tours_qs.filter(status=status_filter)
     
-    # Statistiques globales
-    stats = {
-        'total': tours_qs.count(),
-        'pending': tours_qs.filter(status='pending').count(),
-        'in_progress': tours_qs.filter(status='in_progress').count(),
-        'completed': tours_qs.filter(status='completed').count(),
-        'total_km': tours_qs.aggregate(Sum('kilometers'))['kilometers__sum'] or 0,
-        'total_fuel': tours_qs.aggregate(Sum('fuel_consumption'))['fuel_consumption__sum'] or 0,
-    }
+    # Statistiques globales (un seul agrégat)
+    stats = tours_qs.aggregate(
+        total=Count('id_tour'),
+        pending=Count('id_tour', filter=Q(status='pending')),
+        in_progress=Count('id_tour', filter=Q(status='in_progress')),
+        completed=Count('id_tour', filter=Q(status='completed')),
+        total_km=Sum('kilometers'),
+        total_fuel=Sum('fuel_consumption'),
+    )
+    stats['total_km'] = stats['total_km'] or 0
+    stats['total_fuel'] = stats['total_fuel'] or 0
     
     # Formulaire de création rapide pour le popup
     create_form = TourCreateForm()
     
+    page = paginate(request, tours_qs.with_metrics(), ordering=('-created_at', '-pk'))
+    
     context = {
-        'tours': tours_qs,
+        'tours': page,
+        'page': page,
         'query': query,
         'status_filter': status_filter or 'ALL',
         'stats': stats,
@@ -56,7 +66,7 @@ def tour_list(request):
 @login_required
 def tour_detail(request, pk):
     """Détail d'une tournée avec ses expéditions"""
-    tour = get_object_or_404(Tour, pk=pk)
+    tour = get_object_or_404(Tour.objects.with_metrics().select_related('id_driver', 'id_vehicle'), pk=pk)
     tour_expeditions = tour.tour_expeditions.select_related('expedition').all()
     
     # Formulaire d'ajout d'expédition
@@ -160,10 +170,10 @@ def tour_start(request, pk):
         tour.starting_hour = timezone.now().time()
         tour.save()
         
-        # Mettre les expéditions en transit
-        for te in tour.tour_expeditions.all():
-            te.expedition.status = 'IN_TRANSIT'
-            te.expedition.save()
+        # Mettre les expéditions en transit (une mise à jour groupée)
+        Shipment.objects.filter(tour_assignments__tour=tour).transition(
+            'TRANSIT', changed_by=request.user
+        )
         
         messages.success(request, f'Tournée #{tour.id_tour} démarrée.')
     
@@ -193,16 +203,24 @@ def tour_complete(request, pk):
             tour.comments = form.cleaned_data.get('comments', '')
             tour.save()
             
-            # Marquer les expéditions comme livrées
-            for te in tour.tour_expeditions.all():
-                te.delivered = True
-                te.delivered_at = timezone.now()
-                te.save()
-                te.expedition.status = 'DELIVERED'
-                te.expedition.reel_delivery_date = timezone.now().date()
-                te.expedition.save()
+            # Seules les expéditions en cours de livraison passent à « Livré »
+            # (une mise à jour groupée, une ligne d'historique chacune) ; les
+            # autres n'ont pas été livrées et restent dans leur statut
+            shipments = Shipment.objects.filter(tour_assignments__tour=tour)
+            shipments.transition('DELIVERED', changed_by=request.user)
+            tour.tour_expeditions.filter(expedition__status='DELIVERED', delivered=False).update(
+                delivered=True, delivered_at=timezone.now()
+            )
+            invalidate_tags('tours')
             
             messages.success(request, f'Tournée #{tour.id_tour} terminée avec succès.')
+            not_delivered = list(shipments.exclude(status='DELIVERED').values_list('tracking_number', flat=True))
+            if not_delivered:
+                messages.warning(
+                    request,
+                    f"{len(not_delivered)} expédition(s) non livrée(s), statut inchangé : "
+                    + ', '.join(not_delivered[:10]) + (' ...' if len(not_delivered) > 10 else ''),
+                )
             return redirect('tour:detail', pk=pk)
     else:
         form = TourCompleteForm(initial={
@@ -260,7 +278,34 @@ def remove_expedition(request, pk, expedition_pk):
     return redirect('tour:detail', pk=pk)
 
 
+def tour_slip_shipments(tour):
+    """Expéditions de la tournée avec ce qu'affichent les bons, dans l'ordre de livraison"""
+    return list(
+        slip_queryset(Shipment.objects.filter(tour_assignments__tour=tour))
+        .order_by('tour_assignments__order', 'pk')
+    )
+
+
 @login_required
+def tour_slips(request, pk):
+    """Bons d'expédition de toutes les expéditions de la tournée (un seul PDF).
+
+    Au-delà de INLINE_SLIPS expéditions, le PDF est produit en arrière-plan
+    (apps/jobs) et l'utilisateur suit la tâche.
+    """
+    tour = get_object_or_404(Tour, pk=pk)
+    back_url = reverse('tour:detail', args=[tour.pk])
+    if tour.tour_expeditions.count() > INLINE_SLIPS:
+        job = enqueue(
+            'tour.tour_slips', created_by=request.user,
+            tour_id=tour.pk, base_url=request.build_absolute_uri('/'), back_url=back_url,
+        )
+        return redirect('jobs:detail', pk=job.pk)
+    return slips_response(request, tour_slip_shipments(tour), f'bons_tournee_{tour.pk}', f'Tournée #{tour.pk}', back_url)
+
+
+@login_required
+@cached_view('tours', 'drivers')
 def tour_journal(request):
     """Journal des tournées - analyse des performances"""
     from datetime import timedelta
@@ -296,7 +341,7 @@ def tour_journal(request):
     stats['avg_fuel_per_tour'] = (stats['total_fuel'] or 0) / max(stats['total_tours'] or 1, 1)
     
     context = {
-        'tours': tours_qs.order_by('-tour_date')[:50],
+        'tours': tours_qs.with_metrics().select_related('id_driver', 'id_vehicle').order_by('-tour_date')[:50],
         'stats': stats,
         'period': period,
     }
@@ -305,21 +350,31 @@ def tour_journal(request):
 
 @login_required
 def export_tours_csv(request):
-    """Exporter les tournées en CSV"""
-    response = HttpResponse(
-        content_type='text/csv',
-        headers={'Content-Disposition': 'attachment; filename="tournees.csv"'},
+    """Exporter les tournées en CSV (une seule requête annotée)"""
+    status_display = dict(Tour.STATUS_CHOICES)
+    
+    def row(t):
+        (id_tour, tour_date, first_name, last_name, immatriculation, status,
+         kilometers, fuel_consumption, expedition_count, has_delay, has_technical_issue) = t
+        return [
+            id_tour, tour_date, f"{first_name} {last_name}" if first_name is not None else '',
+            immatriculation or '', status_display.get(status, status),
+            kilometers, fuel_consumption, expedition_count,
+            'Oui' if has_delay else 'Non',
+            'Oui' if has_technical_issue else 'Non'
+        ]
+    
+    tours = Tour.objects.annotate(
+        nb_expeditions=Count('tour_expeditions')
+    ).values_list(
+        'id_tour', 'tour_date', 'id_driver__first_name', 'id_driver__last_name',
+        'id_vehicle__immatriculation', 'status', 'kilometers', 'fuel_consumption',
+        'nb_expeditions', 'has_delay', 'has_technical_issue',
+    )
+    
+    return stream_queryset_csv(
+        'tournees.csv',
+        ['ID', 'Date', 'Chauffeur', 'Véhicule', 'Statut', 'Km', 'Carburant', 'Expéditions', 'Retard', 'Problème technique'],
+        tours,
+        row=row,
     )
-    writer = csv.writer(response)
-    writer.writerow(['ID', 'Date', 'Chauffeur', 'Véhicule', 'Statut', 'Km', 'Carburant', 'Expéditions', 'Retard', 'Problème technique'])
-    
-    for t in Tour.objects.all():
-        driver = f"{t.id_driver}" if t.id_driver else ''
-        vehicle = t.id_vehicle.immatriculation if t.id_vehicle else ''
-        writer.writerow([
-            t.id_tour, t.tour_date, driver, vehicle, t.get_status_display(),
-            t.kilometers, t.fuel_consumption, t.expedition_count,
-            'Oui' if t.has_delay else 'Non',
-            'Oui' if t.has_technical_issue else 'Non'
-        ])
-    return response
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -38,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'apps.core',
     'apps.users',
     'apps.dashboard',
     'apps.clients',
@@ -47,6 +50,7 @@ INSTALLED_APPS = [
     'apps.logistics',
     'apps.facturation',
     'apps.tour',
+    'apps.jobs',
 ]
 
 MIDDLEWARE = [
@@ -87,13 +91,128 @@ WSGI_APPLICATION = 'delivery_management.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Profile chosen from the environment:
+#   DB_ENGINE=postgresql  -> PostgreSQL (DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT)
+#                            with a psycopg connection pool (DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE),
+#                            or persistent connections (DB_POOL=0, DB_CONN_MAX_AGE seconds)
+#   anything else         -> SQLite file DB_PATH (default db.sqlite3), tuned by SQLITE_PRAGMAS
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE in ('postgres', 'postgresql'):
+    DB_POOL = os.environ.get('DB_POOL', '1') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'delivery_management'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # The pool (psycopg[pool]) replaces persistent connections: Django requires CONN_MAX_AGE=0 with it
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+                    'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+                    'timeout': 10,
+                },
+            } if DB_POOL else {},
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_PATH', BASE_DIR / 'db.sqlite3'),
+            # Tests run on a file too, in WAL mode like production (an in-memory
+            # database cannot serve the threads of the concurrency tests). One file
+            # per run, so that a file left by an interrupted run does not block the
+            # next one and runs on the same host do not share a database.
+            'TEST': {
+                'NAME': os.environ.get('DB_TEST_PATH') or os.path.join(
+                    tempfile.gettempdir(), f'delivery_management_test_{os.getpid()}.sqlite3'
+                ),
+            },
+        }
+    }
+
+# Applied to every new SQLite connection (apps/core/db.py): WAL lets readers run
+# while a write is in progress, NORMAL sync is safe with WAL, writers wait up to
+# busy_timeout ms for the lock instead of failing, and reads go through mmap.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', '5000')),
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+
+# Caches
+# CACHE_BACKEND=locmem (default: per process, works offline), file (shared by the
+# processes of one host, under CACHE_DIR) or redis (REDIS_URL, needs the redis package).
+# Named caches: tariffs (pricing tables), stats (statistics pages), sessions.
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+CACHE_DIR = os.environ.get('CACHE_DIR', Path(tempfile.gettempdir()) / 'delivery_management_cache')
+
+# Shipping slips (apps/logistics/slips.py): rendered PDFs are kept under SLIP_CACHE_DIR;
+# batch slips are rendered by SLIP_WORKERS processes (default: one per CPU).
+SLIP_CACHE_DIR = os.environ.get('SLIP_CACHE_DIR', Path(CACHE_DIR) / 'slips')
+SLIP_WORKERS = int(os.environ.get('SLIP_WORKERS', '0')) or None
+
+# Machine APIs (apps/core/api.py): API_KEYS="<key>:<username>,..." maps each key, sent
+# as "Authorization: Bearer <key>", to the account the scanner or client acts as.
+API_KEYS = dict(
+    item.strip().rsplit(':', 1) for item in os.environ.get('API_KEYS', '').split(',') if ':' in item
+)
+
+# Background jobs (apps/jobs/queue.py), run by `manage.py runworker --concurrency N`.
+# JOBS_INLINE=1 runs each job in the web process once its request has committed (no worker,
+# e.g. in development). Failed jobs are retried after JOB_RETRY_DELAY seconds, doubled at
+# each attempt; a job running for longer than JOB_TIMEOUT seconds is queued again.
+JOBS_INLINE = os.environ.get('JOBS_INLINE', '0') == '1'
+JOB_OUTPUT_DIR = os.environ.get('JOB_OUTPUT_DIR', Path(CACHE_DIR) / 'jobs')
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 10
+JOB_RETRY_MAX_DELAY = 60 * 60
+JOB_TIMEOUT = 30 * 60
+
+# Incident alerts (apps/incidents/tasks.py); printed to the console unless EMAIL_BACKEND is set
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'TransportPro <noreply@transportpro.local>')
+
+
+def cache_profile(name, timeout, max_entries=1000):
+    if CACHE_BACKEND == 'redis':
+        return {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+            'KEY_PREFIX': name,
+            'TIMEOUT': timeout,
+        }
+    if CACHE_BACKEND == 'file':
+        backend, location = 'django.core.cache.backends.filebased.FileBasedCache', Path(CACHE_DIR) / name
+    else:
+        backend, location = 'django.core.cache.backends.locmem.LocMemCache', name
+    return {
+        'BACKEND': backend,
+        'LOCATION': location,
+        'TIMEOUT': timeout,
+        'OPTIONS': {'MAX_ENTRIES': max_entries},
+    }
+
+
+CACHES = {
+    'default': cache_profile('default', 300, max_entries=10000),
+    'tariffs': cache_profile('tariffs', None),
+    'stats': cache_profile('stats', 60 * 15),
+    'sessions': cache_profile('sessions', 60 * 60 * 24 * 14, max_entries=10000),
 }
 
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -28,5 +28,6 @@ urlpatterns = [
     path('clients/', include("apps.clients.urls")),
     path("logistics/", include("apps.logistics.urls")),
     path("tournees/", include("apps.tour.urls")),
+    path("jobs/", include("apps.jobs.urls")),
 ]
 